@@ -0,0 +1,271 @@
+"""Agregados diarios de préstamos para los informes.
+
+Cada préstamo suma en el día de su fecha_prestamo y cada devolución en el de
+su fecha_devolucion_real, en dos tablas: agregados_diarios (totales por día)
+y agregados_generos (por mes y género). Se actualizan en la misma transacción
+que la escritura, como los contadores de resumen.py, y los informes solo leen
+estas tablas: cinco años son ~1800 filas diarias, nunca el historial completo.
+
+Una devolución se considera atrasada si llega después de fecha_devolucion.
+"""
+from collections import Counter
+from datetime import date
+
+from archivo import TABLAS_HISTORIAL
+
+# Columnas sumables de las dos tablas
+COLUMNAS = ('prestamos', 'devoluciones', 'devoluciones_atrasadas', 'dias_prestados')
+
+AGRUPACIONES = ('dia', 'mes')
+
+
+def _sumar(cursor, tabla, claves, filas):
+    """Upsert de incrementos; cada fila es (valores de `claves`..., prestamos, devoluciones, atrasadas, dias)"""
+    # Ordenadas por clave: las filas se bloquean siempre en el mismo orden
+    filas = sorted(fila for fila in filas if any(fila[len(claves):]))
+    if not filas:
+        return
+    columnas = claves + COLUMNAS
+    cursor.execute(
+        f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES "
+        + ', '.join(['(' + ', '.join(['%s'] * len(columnas)) + ')'] * len(filas))
+        + " ON DUPLICATE KEY UPDATE "
+        + ', '.join(f'{columna} = {columna} + VALUES({columna})' for columna in COLUMNAS),
+        [valor for fila in filas for valor in fila]
+    )
+
+
+def _filas(cursor):
+    """Filas como tuplas aunque el cursor sea dictionary=True"""
+    return [tuple(fila.values()) if isinstance(fila, dict) else fila for fila in cursor.fetchall()]
+
+
+def _mes(dia):
+    return dia.replace(day=1)
+
+
+def prestamos_registrados(cursor, libro_ids, fecha_prestamo):
+    """Suma los préstamos nuevos de `libro_ids` (con repeticiones) en su día y género.
+
+    `fecha_prestamo` es un `date` ya validado (validacion.validar_prestamo).
+    """
+    dia = fecha_prestamo
+    copias = Counter(libro_ids)
+    marcadores = ', '.join(['%s'] * len(copias))
+    cursor.execute(f"SELECT id, COALESCE(genero, '') FROM libros WHERE id IN ({marcadores})", list(copias))
+    generos = Counter()
+    for libro_id, genero in _filas(cursor):
+        generos[genero] += copias[libro_id]
+    _sumar(cursor, 'agregados_diarios', ('dia',), [(dia, len(libro_ids), 0, 0, 0)])
+    _sumar(cursor, 'agregados_generos', ('mes', 'genero'),
+           [(_mes(dia), genero, cantidad, 0, 0, 0) for genero, cantidad in generos.items()])
+
+
+def _devoluciones(cursor, prestamo_ids, signo):
+    """(dia, genero, devoluciones, atrasadas, dias) de los préstamos devueltos indicados"""
+    marcadores = ', '.join(['%s'] * len(prestamo_ids))
+    cursor.execute(
+        f"""SELECT p.fecha_devolucion_real, COALESCE(l.genero, ''), COUNT(*),
+               SUM(p.fecha_devolucion_real > p.fecha_devolucion),
+               SUM(DATEDIFF(p.fecha_devolucion_real, p.fecha_prestamo))
+        FROM prestamos p JOIN libros l ON l.id = p.libro_id
+        WHERE p.id IN ({marcadores}) AND p.fecha_devolucion_real IS NOT NULL
+        GROUP BY p.fecha_devolucion_real, l.genero""",
+        list(prestamo_ids)
+    )
+    return [(dia, genero, signo * int(total), signo * int(atrasadas or 0), signo * int(dias or 0))
+            for dia, genero, total, atrasadas, dias in _filas(cursor)]
+
+
+def _sumar_devoluciones(cursor, devoluciones):
+    por_dia = {}
+    por_genero = {}
+    for dia, genero, total, atrasadas, dias in devoluciones:
+        for destino, clave in ((por_dia, (dia,)), (por_genero, (_mes(dia), genero))):
+            anterior = destino.get(clave, (0, 0, 0))
+            destino[clave] = (anterior[0] + total, anterior[1] + atrasadas, anterior[2] + dias)
+    _sumar(cursor, 'agregados_diarios', ('dia',),
+           [clave + (0,) + valores for clave, valores in por_dia.items()])
+    _sumar(cursor, 'agregados_generos', ('mes', 'genero'),
+           [clave + (0,) + valores for clave, valores in por_genero.items()])
+
+
+def prestamos_devueltos(cursor, prestamo_ids):
+    """Suma las devoluciones; llamar después de marcar los préstamos como devueltos"""
+    _sumar_devoluciones(cursor, _devoluciones(cursor, prestamo_ids, 1))
+
+
+def prestamo_eliminado(cursor, prestamo_id):
+    """Descuenta un préstamo devuelto que se va a borrar. Llamar antes del DELETE"""
+    cursor.execute(
+        """SELECT p.fecha_prestamo, COALESCE(l.genero, '')
+        FROM prestamos p JOIN libros l ON l.id = p.libro_id WHERE p.id = %s""",
+        (prestamo_id,)
+    )
+    filas = _filas(cursor)
+    if not filas:
+        return
+    dia, genero = filas[0]
+    _sumar(cursor, 'agregados_diarios', ('dia',), [(dia, -1, 0, 0, 0)])
+    _sumar(cursor, 'agregados_generos', ('mes', 'genero'), [(_mes(dia), genero, -1, 0, 0, 0)])
+    _sumar_devoluciones(cursor, _devoluciones(cursor, [prestamo_id], -1))
+
+
+def libro_eliminado(cursor, libro_id):
+    """Descuenta todos los préstamos del libro, que se borran en cascada con él. Llamar antes del DELETE"""
+    cursor.execute("SELECT COALESCE(genero, '') FROM libros WHERE id = %s", (libro_id,))
+    filas = _filas(cursor)
+    if not filas:
+        return
+    genero = filas[0][0]
+    prestamos = Counter()
+    devoluciones = []
+    for tabla in TABLAS_HISTORIAL:
+        cursor.execute(
+            f"SELECT fecha_prestamo, COUNT(*) FROM {tabla} WHERE libro_id = %s GROUP BY fecha_prestamo",
+            (libro_id,)
+        )
+        for dia, total in _filas(cursor):
+            prestamos[dia] += int(total)
+        cursor.execute(
+            f"""SELECT fecha_devolucion_real, COUNT(*),
+                   SUM(fecha_devolucion_real > fecha_devolucion),
+                   SUM(DATEDIFF(fecha_devolucion_real, fecha_prestamo))
+            FROM {tabla}
+            WHERE libro_id = %s AND estado = 'devuelto' AND fecha_devolucion_real IS NOT NULL
+            GROUP BY fecha_devolucion_real""",
+            (libro_id,)
+        )
+        devoluciones.extend((dia, genero, -int(total), -int(atrasadas or 0), -int(dias or 0))
+                            for dia, total, atrasadas, dias in _filas(cursor))
+    por_mes = Counter()
+    for dia, total in prestamos.items():
+        por_mes[_mes(dia)] += total
+    _sumar(cursor, 'agregados_diarios', ('dia',), [(dia, -total, 0, 0, 0) for dia, total in prestamos.items()])
+    _sumar(cursor, 'agregados_generos', ('mes', 'genero'),
+           [(mes, genero, -total, 0, 0, 0) for mes, total in por_mes.items()])
+    _sumar_devoluciones(cursor, devoluciones)
+
+
+# ==================== RECÁLCULO ====================
+
+def meses_con_historial(cursor):
+    """Primer día de cada mes con algún préstamo, en orden (hasta el mes actual)"""
+    primero = None
+    for tabla in TABLAS_HISTORIAL:
+        cursor.execute(f"SELECT MIN(fecha_prestamo) FROM {tabla}")
+        fecha = cursor.fetchone()[0]
+        if fecha is not None and (primero is None or fecha < primero):
+            primero = fecha
+    if primero is None:
+        return []
+    meses = []
+    mes, ultimo = _mes(primero), _mes(date.today())
+    while mes <= ultimo:
+        meses.append(mes)
+        mes = _mes_siguiente(mes)
+    return meses
+
+
+def _mes_siguiente(mes):
+    return date(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+
+
+def reconstruir_mes(cursor, mes):
+    """Recalcula los agregados de un mes desde prestamos y el archivo"""
+    mes = _mes(mes)
+    siguiente = _mes_siguiente(mes)
+    prestamos = Counter()
+    devoluciones = []
+    for tabla in TABLAS_HISTORIAL:
+        # Préstamos por su fecha de préstamo (idx_prestamos_fecha / idx_archivo_fecha)
+        cursor.execute(
+            f"""SELECT p.fecha_prestamo, COALESCE(l.genero, ''), COUNT(*)
+            FROM {tabla} p JOIN libros l ON l.id = p.libro_id
+            WHERE p.fecha_prestamo >= %s AND p.fecha_prestamo < %s
+            GROUP BY p.fecha_prestamo, l.genero""",
+            (mes, siguiente)
+        )
+        for dia, genero, total in cursor.fetchall():
+            prestamos[(dia, genero)] += total
+        # Devoluciones por su fecha real
+        cursor.execute(
+            f"""SELECT p.fecha_devolucion_real, COALESCE(l.genero, ''), COUNT(*),
+                   SUM(p.fecha_devolucion_real > p.fecha_devolucion),
+                   SUM(DATEDIFF(p.fecha_devolucion_real, p.fecha_prestamo))
+            FROM {tabla} p JOIN libros l ON l.id = p.libro_id
+            WHERE p.estado = 'devuelto' AND p.fecha_devolucion_real >= %s AND p.fecha_devolucion_real < %s
+            GROUP BY p.fecha_devolucion_real, l.genero""",
+            (mes, siguiente)
+        )
+        devoluciones.extend((dia, genero, int(total), int(atrasadas or 0), int(dias or 0))
+                            for dia, genero, total, atrasadas, dias in cursor.fetchall())
+
+    cursor.execute("DELETE FROM agregados_diarios WHERE dia >= %s AND dia < %s", (mes, siguiente))
+    cursor.execute("DELETE FROM agregados_generos WHERE mes = %s", (mes,))
+    por_dia = Counter()
+    por_genero = Counter()
+    for (dia, genero), total in prestamos.items():
+        por_dia[dia] += total
+        por_genero[genero] += total
+    _sumar(cursor, 'agregados_diarios', ('dia',), [(dia, total, 0, 0, 0) for dia, total in por_dia.items()])
+    _sumar(cursor, 'agregados_generos', ('mes', 'genero'),
+           [(mes, genero, total, 0, 0, 0) for genero, total in por_genero.items()])
+    _sumar_devoluciones(cursor, devoluciones)
+
+
+def reconstruir(conn, desde=None, progreso=None):
+    """Recalcula los agregados mes a mes (desde el mes de `desde`, o todos), con un commit por mes"""
+    cursor = conn.cursor()
+    meses = meses_con_historial(cursor)
+    if desde is not None:
+        meses = [mes for mes in meses if mes >= _mes(desde)]
+    for mes in meses:
+        reconstruir_mes(cursor, mes)
+        conn.commit()
+        if progreso:
+            progreso(mes)
+    cursor.close()
+    return len(meses)
+
+
+# ==================== INFORMES ====================
+
+def _metricas(fila):
+    """Añade duración media y tasa de atraso a una fila de sumas"""
+    fila = {clave: int(valor) if clave in COLUMNAS else valor for clave, valor in fila.items()}
+    devoluciones = fila['devoluciones']
+    fila['duracion_media'] = round(fila['dias_prestados'] / devoluciones, 2) if devoluciones else None
+    fila['tasa_atraso'] = round(fila['devoluciones_atrasadas'] / devoluciones, 4) if devoluciones else None
+    return fila
+
+
+def _sumas():
+    return ', '.join(f'SUM({columna}) AS {columna}' for columna in COLUMNAS)
+
+
+def por_periodo(cursor, desde, hasta, agrupar='dia'):
+    """Préstamos y devoluciones por día o por mes entre dos fechas (incluidas)"""
+    formato = '%Y-%m-%d' if agrupar == 'dia' else '%Y-%m'
+    cursor.execute(
+        f"""SELECT DATE_FORMAT(dia, '{formato}') AS periodo, {_sumas()} FROM agregados_diarios
+        WHERE dia BETWEEN %s AND %s GROUP BY periodo ORDER BY periodo""",
+        (desde, hasta)
+    )
+    return [_metricas(fila) for fila in cursor.fetchall()]
+
+
+def por_genero(cursor, desde, hasta):
+    """Totales por género de los meses entre las dos fechas"""
+    cursor.execute(
+        f"""SELECT genero, {_sumas()} FROM agregados_generos
+        WHERE mes BETWEEN %s AND %s GROUP BY genero ORDER BY prestamos DESC, genero""",
+        (_mes(desde), _mes(hasta))
+    )
+    return [_metricas(fila) for fila in cursor.fetchall()]
+
+
+def totales(cursor, desde, hasta):
+    """Sumas de todo el intervalo"""
+    cursor.execute(f"SELECT {_sumas()} FROM agregados_diarios WHERE dia BETWEEN %s AND %s", (desde, hasta))
+    return _metricas({clave: valor or 0 for clave, valor in cursor.fetchone().items()})
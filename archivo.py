@@ -0,0 +1,60 @@
+"""Archivo de préstamos devueltos: separa el historial frío de la tabla caliente.
+
+Los préstamos devueltos hace más de N días se mueven a prestamos_archivo en
+lotes acotados (INSERT ... SELECT + DELETE por id en una transacción
+corta). Los contadores de resumen_libros no cambian: el ranking de libros
+populares sigue incluyendo el historial archivado.
+"""
+import time
+
+COLUMNAS = ('id, libro_id, prestatario_id, nombre_prestatario, email_prestatario, telefono, fecha_prestamo, '
+            'fecha_devolucion, fecha_devolucion_real, estado, observaciones')
+TAMANO_LOTE = 1000
+# Historial completo de préstamos (la migración 008 crea el archivo antes que cualquier código que lo lea)
+TABLAS_HISTORIAL = ('prestamos', 'prestamos_archivo')
+
+
+def archivar(conn, limite_fecha, tamano_lote=TAMANO_LOTE, progreso=None):
+    """Archiva los préstamos devueltos antes de `limite_fecha`. Devuelve filas, lotes y duración"""
+    reloj = time.monotonic()
+    filas = lotes = 0
+    cursor = conn.cursor()
+
+    # Keyset sobre (fecha_devolucion_real, id), el orden del índice
+    # idx_prestamos_estado_real (estado, fecha_devolucion_real, id): cada lote lee
+    # y bloquea solo sus filas, sin volver a recorrer el rango ya archivado
+    ultimo = None
+    while True:
+        condicion, parametros = '', [limite_fecha]
+        if ultimo is not None:
+            condicion = " AND (fecha_devolucion_real > %s OR (fecha_devolucion_real = %s AND id > %s))"
+            parametros += [ultimo[0], ultimo[0], ultimo[1]]
+        cursor.execute(
+            "SELECT fecha_devolucion_real, id FROM prestamos WHERE estado = 'devuelto' AND fecha_devolucion_real < %s"
+            + condicion + " ORDER BY fecha_devolucion_real, id LIMIT %s FOR UPDATE",
+            parametros + [tamano_lote]
+        )
+        seleccion = cursor.fetchall()
+        if not seleccion:
+            conn.commit()
+            break
+        ultimo = tuple(seleccion[-1])
+        ids = [fila[1] for fila in seleccion]
+
+        marcadores = ', '.join(['%s'] * len(ids))
+        cursor.execute(
+            f"INSERT INTO prestamos_archivo ({COLUMNAS}) "
+            f"SELECT {COLUMNAS} FROM prestamos WHERE id IN ({marcadores})",
+            ids
+        )
+        cursor.execute(f"DELETE FROM prestamos WHERE id IN ({marcadores})", ids)
+        conn.commit()
+        filas += len(ids)
+        lotes += 1
+        if progreso:
+            progreso(filas)
+        if len(ids) < tamano_lote:
+            break
+
+    cursor.close()
+    return {'filas': filas, 'lotes': lotes, 'duracion_ms': int((time.monotonic() - reloj) * 1000)}
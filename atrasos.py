@@ -0,0 +1,93 @@
+"""Barrido de préstamos vencidos: pasa a 'atrasado' los préstamos cuya fecha
+de devolución ya pasó, en lotes acotados que aprovechan el índice
+(estado, fecha_devolucion), y registra cada barrido.
+"""
+import logging
+import threading
+import time
+from datetime import date, datetime
+
+import mysql.connector
+
+import resumen
+
+TAMANO_LOTE = 1000
+
+logger = logging.getLogger('biblioteca.atrasos')
+
+
+def marcar_atrasados(conn, hoy=None, tamano_lote=TAMANO_LOTE):
+    """Ejecuta un barrido completo; cada lote es una transacción corta.
+
+    Devuelve un diccionario con filas marcadas, lotes y duración.
+    """
+    hoy = hoy or date.today()
+    inicio = datetime.now()
+    reloj = time.monotonic()
+    filas = lotes = 0
+    cursor = conn.cursor()
+
+    while True:
+        cursor.execute(
+            "UPDATE prestamos SET estado = 'atrasado' "
+            "WHERE estado = 'prestado' AND fecha_devolucion < %s LIMIT %s",
+            (hoy, tamano_lote)
+        )
+        marcadas = cursor.rowcount
+        if marcadas:
+            resumen.sumar(cursor, prestamos_activos=-marcadas, prestamos_atrasados=marcadas)
+        conn.commit()
+        filas += marcadas
+        lotes += 1
+        if marcadas < tamano_lote:
+            break
+
+    duracion_ms = int((time.monotonic() - reloj) * 1000)
+    cursor.execute(
+        "INSERT INTO barridos_atrasados (inicio, duracion_ms, filas, lotes) VALUES (%s, %s, %s, %s)",
+        (inicio, duracion_ms, filas, lotes)
+    )
+    conn.commit()
+    cursor.close()
+    return {'inicio': inicio, 'duracion_ms': duracion_ms, 'filas': filas, 'lotes': lotes}
+
+
+def ultimos_barridos(cursor, limite=20):
+    cursor.execute(
+        "SELECT inicio, duracion_ms, filas, lotes FROM barridos_atrasados ORDER BY id DESC LIMIT %s",
+        (limite,)
+    )
+    return cursor.fetchall()
+
+
+class ProgramadorAtrasos:
+    """Hilo en segundo plano que lanza un barrido cada `intervalo` segundos"""
+
+    def __init__(self, obtener_conexion, intervalo, tamano_lote=TAMANO_LOTE):
+        self.obtener_conexion = obtener_conexion
+        self.intervalo = intervalo
+        self.tamano_lote = tamano_lote
+        self.ultimo = None
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._ejecutar, name='barrido-atrasos', daemon=True)
+
+    def iniciar(self):
+        self._hilo.start()
+
+    def detener(self):
+        self._parar.set()
+
+    def _ejecutar(self):
+        while not self._parar.wait(self.intervalo):
+            conn = self.obtener_conexion()
+            if not conn:
+                continue
+            try:
+                self.ultimo = marcar_atrasados(conn, tamano_lote=self.tamano_lote)
+                if self.ultimo['filas']:
+                    logger.info("⏰ Barrido de atrasos: %s préstamo(s) en %s ms",
+                                self.ultimo['filas'], self.ultimo['duracion_ms'])
+            except mysql.connector.Error as err:
+                logger.error("❌ Error en el barrido de atrasos: %s", err)
+            finally:
+                conn.close()
@@ -0,0 +1 @@
+"""Benchmarks de carga: `python -m benchmarks.sembrar` y `python -m benchmarks.carga`."""
@@ -0,0 +1,176 @@
+"""Genera carga concurrente contra una instancia en marcha y mide latencias.
+
+Uso (con la aplicación apuntando a la base sembrada por benchmarks.sembrar):
+
+    DB_HOST=127.0.0.1 DB_NAME=biblioteca_bench ATRASOS_INTERVALO=0 flask --app app run --port 5000
+    python -m benchmarks.carga --url http://127.0.0.1:5000 --hilos 16 --duracion 60 \
+        --libros 1000000 --prestamos 10000000 --prestatarios 1000000
+
+Cada hilo elige una operación según los pesos de MEZCLA y la ejecuta sin
+seguir redirecciones (se mide la ruta, no la página de destino). Al final
+imprime por ruta peticiones, errores, peticiones/s y p50/p95/p99 en ms.
+
+Los préstamos se reparten entre los prestatarios sembrados (mismo email que
+benchmarks.sembrar), así que el límite PRESTATARIO_MAX_ACTIVOS solo rechaza
+los de quien ya tenga muchos abiertos, como en un mostrador real.
+"""
+import argparse
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from benchmarks.sembrar import GENEROS, PALABRAS, prestatario_sembrado
+
+# (nombre, peso): proporción aproximada del tráfico de un mostrador
+MEZCLA = (
+    ('index', 10),
+    ('libros', 15),
+    ('libros_busqueda', 15),
+    ('prestamos', 10),
+    ('prestamos_estado', 10),
+    ('disponibles', 30),
+    ('prestar', 5),
+    ('devolver', 5),
+)
+
+
+class SinRedirecciones(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Cliente:
+    def __init__(self, url, total_libros, total_prestamos, total_prestatarios, semilla):
+        self.url = url.rstrip('/')
+        self.total_libros = total_libros
+        self.total_prestamos = total_prestamos
+        self.total_prestatarios = total_prestatarios
+        self.rnd = random.Random(semilla)
+        self.opener = urllib.request.build_opener(SinRedirecciones)
+
+    def pedir(self, ruta, params=None, datos=None):
+        url = self.url + ruta
+        if params:
+            url += '?' + urllib.parse.urlencode(params)
+        cuerpo = urllib.parse.urlencode(datos).encode() if datos is not None else None
+        try:
+            with self.opener.open(url, cuerpo, timeout=30) as respuesta:
+                respuesta.read()
+                return respuesta.status, respuesta.headers
+        except urllib.error.HTTPError as err:
+            err.read()
+            return err.code, err.headers
+
+    def index(self):
+        return self.pedir('/')
+
+    def libros(self):
+        return self.pedir('/libros', {'genero': self.rnd.choice(GENEROS)} if self.rnd.random() < 0.5 else None)
+
+    def libros_busqueda(self):
+        return self.pedir('/libros', {'busqueda': ' '.join(self.rnd.sample(PALABRAS, 2))})
+
+    def prestamos(self):
+        return self.pedir('/prestamos')
+
+    def prestamos_estado(self):
+        return self.pedir('/prestamos', {'estado': self.rnd.choice(('prestado', 'devuelto', 'atrasado'))})
+
+    def disponibles(self):
+        return self.pedir('/api/libros/disponibles')
+
+    def prestar(self):
+        hoy = date.today()
+        nombre, email, telefono = prestatario_sembrado(self.rnd.randint(1, self.total_prestatarios))
+        return self.pedir('/prestamos/nuevo', datos={
+            'libro_id': self.rnd.randint(1, self.total_libros),
+            'nombre_prestatario': nombre,
+            'email_prestatario': email,
+            'telefono': telefono,
+            'fecha_prestamo': hoy.isoformat(),
+            'fecha_devolucion': (hoy + timedelta(days=15)).isoformat(),
+        })
+
+    def devolver(self):
+        # La mayoría de los préstamos sembrados ya están devueltos: el rechazo
+        # recorre la misma actualización condicional y también cuenta
+        return self.pedir(f'/prestamos/devolver/{self.rnd.randint(1, self.total_prestamos)}')
+
+
+class Resultados:
+    def __init__(self):
+        self.latencias = {}
+        self.errores = {}
+        self._lock = threading.Lock()
+
+    def anotar(self, nombre, segundos, error):
+        with self._lock:
+            self.latencias.setdefault(nombre, []).append(segundos)
+            if error:
+                self.errores[nombre] = self.errores.get(nombre, 0) + 1
+
+
+def percentil(ordenadas, p):
+    if not ordenadas:
+        return 0.0
+    return ordenadas[min(len(ordenadas) - 1, int(round(p / 100 * (len(ordenadas) - 1))))]
+
+
+def trabajador(url, total_libros, total_prestamos, total_prestatarios, semilla, fin, resultados):
+    cliente = Cliente(url, total_libros, total_prestamos, total_prestatarios, semilla)
+    nombres = [nombre for nombre, _ in MEZCLA]
+    pesos = [peso for _, peso in MEZCLA]
+    while time.monotonic() < fin:
+        nombre = cliente.rnd.choices(nombres, pesos)[0]
+        inicio = time.perf_counter()
+        try:
+            estado, _ = getattr(cliente, nombre)()
+            error = estado >= 400
+        except OSError:
+            error = True
+        resultados.anotar(nombre, time.perf_counter() - inicio, error)
+
+
+def informe(resultados, duracion):
+    print(f"{'ruta':<18}{'peticiones':>11}{'errores':>9}{'pet/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    total = 0
+    for nombre, _ in MEZCLA:
+        latencias = sorted(resultados.latencias.get(nombre, []))
+        total += len(latencias)
+        print(f"{nombre:<18}{len(latencias):>11}{resultados.errores.get(nombre, 0):>9}"
+              f"{len(latencias) / duracion:>9.1f}"
+              + ''.join(f"{percentil(latencias, p) * 1000:>9.1f}" for p in (50, 95, 99)))
+    todas = sorted(l for latencias in resultados.latencias.values() for l in latencias)
+    print(f"{'total':<18}{total:>11}{sum(resultados.errores.values()):>9}{total / duracion:>9.1f}"
+          + ''.join(f"{percentil(todas, p) * 1000:>9.1f}" for p in (50, 95, 99)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--hilos', type=int, default=16)
+    parser.add_argument('--duracion', type=float, default=60, help='Segundos de carga')
+    parser.add_argument('--libros', type=int, default=1_000_000, help='Libros sembrados (rango de ids)')
+    parser.add_argument('--prestamos', type=int, default=10_000_000, help='Préstamos sembrados (rango de ids)')
+    parser.add_argument('--prestatarios', type=int, default=1_000_000, help='Prestatarios sembrados')
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    resultados = Resultados()
+    print(f"🚀 {args.hilos} hilo(s) durante {args.duracion:.0f}s contra {args.url}")
+    inicio = time.monotonic()
+    fin = inicio + args.duracion
+    with ThreadPoolExecutor(max_workers=args.hilos) as ejecutor:
+        for i in range(args.hilos):
+            ejecutor.submit(trabajador, args.url, args.libros, args.prestamos, args.prestatarios,
+                            args.semilla + i, fin, resultados)
+    informe(resultados, time.monotonic() - inicio)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""Siembra una base de datos MySQL local con volúmenes configurables.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.sembrar --libros 1000000 --prestamos 10000000 --prestatarios 1000000 --vaciar
+
+Se conecta con las mismas variables DB_* que la aplicación, pero por
+defecto a 127.0.0.1 y a la base `biblioteca_bench`, nunca al servidor de
+producción. Aplica las migraciones, inserta por bloques con INSERT de
+varias filas y al final ajusta la disponibilidad y reconstruye los
+contadores del panel, los de préstamos activos por prestatario y los
+agregados de los informes. Con la misma --semilla los datos son idénticos.
+"""
+import argparse
+import os
+import random
+import time
+from datetime import date, timedelta
+
+import mysql.connector
+
+import agregados
+import disponibilidad
+import migraciones
+import prestatarios
+import resumen
+
+PALABRAS = (
+    'sombra', 'viento', 'ciudad', 'noche', 'mar', 'historia', 'jardin', 'tiempo', 'fuego', 'silencio',
+    'camino', 'memoria', 'luz', 'sueño', 'bosque', 'rio', 'piedra', 'invierno', 'verano', 'guerra',
+    'amor', 'cielo', 'tierra', 'espejo', 'puerta', 'reino', 'isla', 'montaña', 'secreto', 'viaje',
+)
+NOMBRES = ('Ana', 'Luis', 'María', 'Carlos', 'Lucía', 'Jorge', 'Elena', 'Pablo', 'Sofía', 'Diego')
+APELLIDOS = ('García', 'Martínez', 'López', 'Sánchez', 'Pérez', 'Gómez', 'Díaz', 'Torres', 'Ruiz', 'Vargas')
+GENEROS = ('Novela', 'Poesía', 'Ensayo', 'Historia', 'Ciencia', 'Infantil', 'Biografía', 'Teatro')
+EDITORIALES = ('Alfaguara', 'Anagrama', 'Planeta', 'Tusquets', 'Salamandra', 'Cátedra')
+FECHA_INICIAL = date(2015, 1, 1)
+# Tablas de datos que vacía --vaciar (los ids vuelven a empezar en 1)
+TABLAS = (
+    'notificaciones', 'eventos_disponibilidad', 'secuencias', 'cache_generaciones', 'barridos_atrasados',
+    'agregados_diarios', 'agregados_generos', 'prestamos_archivo', 'prestamos', 'prestatarios',
+    'resumen_libros', 'resumen_contadores', 'libros',
+)
+
+
+def conectar():
+    return mysql.connector.connect(
+        host=os.environ.get('DB_HOST', '127.0.0.1'),
+        port=int(os.environ.get('DB_PORT', 3306)),
+        user=os.environ.get('DB_USER', 'root'),
+        password=os.environ.get('DB_PASSWORD', ''),
+        database=os.environ.get('DB_NAME', 'biblioteca_bench'),
+        charset='utf8mb4',
+        collation='utf8mb4_unicode_ci',
+    )
+
+
+def _libro(rnd, numero):
+    titulo = ' '.join(rnd.choice(PALABRAS) for _ in range(rnd.randint(2, 4))).capitalize()
+    autor = f'{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)}'
+    ejemplares = rnd.randint(1, 5)
+    return (titulo, autor, f'978{numero:010d}', rnd.choice(GENEROS), rnd.randint(1900, 2024),
+            rnd.choice(EDITORIALES), ejemplares, ejemplares)
+
+
+def prestatario_sembrado(numero):
+    """Prestatario número `numero` (desde 1): su id tras sembrar sobre la tabla vacía"""
+    nombre = f'{NOMBRES[numero % len(NOMBRES)]} {APELLIDOS[numero // len(NOMBRES) % len(APELLIDOS)]}'
+    return nombre, f'lector{numero}@example.com', f'6{numero:08d}'
+
+
+def _prestamo(rnd, total_libros, total_prestatarios, hoy):
+    fecha_prestamo = FECHA_INICIAL + timedelta(days=rnd.randint(0, (hoy - FECHA_INICIAL).days))
+    fecha_devolucion = fecha_prestamo + timedelta(days=15)
+    # La gran mayoría de los préstamos históricos ya están devueltos
+    if rnd.random() < 0.97:
+        estado, real = 'devuelto', fecha_prestamo + timedelta(days=rnd.randint(1, 20))
+    else:
+        estado, real = ('atrasado' if fecha_devolucion < hoy else 'prestado'), None
+    prestatario_id = rnd.randint(1, total_prestatarios)
+    nombre, email, telefono = prestatario_sembrado(prestatario_id)
+    return (rnd.randint(1, total_libros), prestatario_id, nombre, email, telefono,
+            fecha_prestamo, fecha_devolucion, real, estado)
+
+
+def insertar(conn, sql, generar, total, tamano_lote, nombre):
+    """Inserta `total` filas de `generar()` en bloques, con un commit por bloque"""
+    cursor = conn.cursor()
+    inicio = time.monotonic()
+    hechas = 0
+    while hechas < total:
+        lote = [generar(hechas + i) for i in range(min(tamano_lote, total - hechas))]
+        # executemany convierte un INSERT ... VALUES en una única sentencia de varias filas
+        cursor.executemany(sql, lote)
+        conn.commit()
+        hechas += len(lote)
+        if hechas % (tamano_lote * 20) == 0 or hechas == total:
+            print(f"   {nombre}: {hechas}/{total} ({hechas / (time.monotonic() - inicio):.0f} filas/s)")
+    cursor.close()
+
+
+def sembrar(conn, libros, prestamos, total_prestatarios=1_000_000, semilla=42, tamano_lote=5000, vaciar=False):
+    rnd = random.Random(semilla)
+    hoy = date.today()
+    cursor = conn.cursor()
+
+    print("🚀 Aplicando migraciones...")
+    migraciones.migrar(conn)
+
+    # Solo para esta sesión de carga: sin comprobaciones fila a fila
+    cursor.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0")
+    if vaciar:
+        for tabla in TABLAS:
+            cursor.execute(f"TRUNCATE TABLE {tabla}")
+        # La migración 012 sembró el contador de lotes; sellar() lo actualiza sin crearlo
+        cursor.execute("INSERT INTO secuencias (clave, valor) VALUES (%s, 0)", (disponibilidad.SECUENCIA,))
+    # Los ids de libros y prestatarios se dan por consecutivos desde 1
+    for tabla in ('libros', 'prestatarios'):
+        cursor.execute(f"SELECT COUNT(*) FROM {tabla}")
+        if cursor.fetchone()[0]:
+            raise SystemExit(f'La base de datos ya tiene {tabla}; usa --vaciar para empezar de cero')
+
+    insertar(conn,
+             """INSERT INTO libros (titulo, autor, isbn, genero, anio_publicacion, editorial,
+             ejemplares, ejemplares_disponibles) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
+             lambda numero: _libro(rnd, numero), libros, tamano_lote, 'libros')
+    insertar(conn,
+             "INSERT INTO prestatarios (nombre, email, telefono) VALUES (%s, %s, %s)",
+             lambda numero: prestatario_sembrado(numero + 1), total_prestatarios, tamano_lote, 'prestatarios')
+    insertar(conn,
+             """INSERT INTO prestamos (libro_id, prestatario_id, nombre_prestatario, email_prestatario, telefono,
+             fecha_prestamo, fecha_devolucion, fecha_devolucion_real, estado)
+             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+             lambda _: _prestamo(rnd, libros, total_prestatarios, hoy), prestamos, tamano_lote, 'préstamos')
+
+    print("📚 Ajustando ejemplares disponibles y contadores...")
+    cursor.execute(
+        """UPDATE libros l
+        JOIN (SELECT libro_id, COUNT(*) AS abiertos FROM prestamos
+              WHERE estado <> 'devuelto' GROUP BY libro_id) p ON p.libro_id = l.id
+        SET l.ejemplares = GREATEST(l.ejemplares, p.abiertos),
+            l.ejemplares_disponibles = GREATEST(l.ejemplares, p.abiertos) - p.abiertos"""
+    )
+    resumen.reconstruir(cursor)
+    prestatarios.recontar(cursor)
+    conn.commit()
+    print("📊 Reconstruyendo los agregados de los informes...")
+    agregados.reconstruir(conn)
+    cursor.execute("SET SESSION foreign_key_checks = 1, unique_checks = 1")
+    cursor.execute("ANALYZE TABLE libros, prestatarios, prestamos")
+    cursor.fetchall()
+    cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--libros', type=int, default=1_000_000)
+    parser.add_argument('--prestamos', type=int, default=10_000_000)
+    parser.add_argument('--prestatarios', type=int, default=1_000_000)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--lote', type=int, default=5000, help='Filas por INSERT')
+    parser.add_argument('--vaciar', action='store_true', help='Vacía las tablas antes de sembrar')
+    args = parser.parse_args()
+
+    conn = conectar()
+    inicio = time.monotonic()
+    try:
+        sembrar(conn, args.libros, args.prestamos, args.prestatarios, args.semilla, args.lote, args.vaciar)
+    finally:
+        conn.close()
+    print(f"✅ Base de datos sembrada en {time.monotonic() - inicio:.0f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import re
+
+# Valores por defecto de InnoDB: innodb_ft_min_token_size y su lista de stopwords.
+# Un término obligatorio (+palabra) que InnoDB no indexa anula toda la búsqueda.
+LONGITUD_MINIMA = 3
+PALABRAS_VACIAS = {
+    'about', 'and', 'are', 'com', 'for', 'from', 'how', 'that', 'the', 'this',
+    'was', 'what', 'when', 'where', 'who', 'will', 'with', 'und', 'www',
+}
+
+COLUMNAS_TEXTO = 'titulo, autor, editorial'
+ISBN_RE = re.compile(r'^[0-9Xx][0-9Xx\- ]{8,18}[0-9Xx]$')
+
+
+def parece_isbn(texto):
+    return bool(ISBN_RE.match(texto)) and sum(c.isdigit() for c in texto) >= 9
+
+
+def terminos(texto):
+    """Palabras indexables del texto buscado, sin operadores de MATCH"""
+    palabras = re.findall(r'\w+', texto.lower())
+    return [p for p in palabras if len(p) >= LONGITUD_MINIMA and p not in PALABRAS_VACIAS]
+
+
+def expresion_booleana(texto):
+    """Convierte el texto del usuario en `+palabra* +otra*` para BOOLEAN MODE"""
+    return ' '.join(f'+{p}*' for p in terminos(texto))
+
+
+def consulta_catalogo(busqueda, genero=''):
+    """Construye la consulta de búsqueda del catálogo.
+
+    Devuelve (query, params, orden, descendente) listos para `paginar`:
+    - si el texto parece un ISBN, búsqueda exacta por el índice único;
+    - si tiene palabras indexables, MATCH sobre el índice FULLTEXT
+      ordenado por relevancia (la colación utf8mb4_unicode_ci ignora acentos);
+    - en otro caso (términos muy cortos), LIKE por prefijo del título, que
+      recorre solo un rango de idx_libros_titulo ya en el orden de la página.
+    """
+    filtro_genero = ''
+    params_genero = []
+    if genero:
+        filtro_genero = " AND genero = %s"
+        params_genero = [genero]
+
+    if parece_isbn(busqueda.strip()):
+        isbn = busqueda.strip()
+        return (
+            "SELECT * FROM libros WHERE isbn IN (%s, %s)" + filtro_genero,
+            [isbn, re.sub(r'[\s-]', '', isbn)] + params_genero,
+            [('titulo', 'titulo'), ('id', 'id')],
+            False,
+        )
+
+    expresion = expresion_booleana(busqueda)
+    if expresion:
+        match = f"MATCH({COLUMNAS_TEXTO}) AGAINST (%s IN BOOLEAN MODE)"
+        return (
+            f"""SELECT * FROM (
+                    SELECT libros.*, CAST({match} AS DECIMAL(12,6)) AS relevancia
+                    FROM libros
+                    WHERE {match}{filtro_genero}
+                ) AS resultados WHERE 1=1""",
+            [expresion, expresion] + params_genero,
+            [('relevancia', 'relevancia'), ('id', 'id')],
+            True,
+        )
+
+    prefijo = busqueda.strip().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    return (
+        "SELECT * FROM libros WHERE titulo LIKE %s" + filtro_genero,
+        [prefijo] + params_genero,
+        [('titulo', 'titulo'), ('id', 'id')],
+        False,
+    )
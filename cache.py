@@ -0,0 +1,210 @@
+"""Caché de lecturas del catálogo: LRU en memoria con TTL, invalidación
+explícita y, opcionalmente, un contador de generación compartido en la
+base de datos para que todos los workers invaliden a la vez.
+"""
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import mysql.connector
+
+
+class CacheLRU:
+    """Diccionario acotado por número de entradas y por antigüedad"""
+
+    def __init__(self, max_entradas=256, ttl=60.0):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        # Cambia en cada invalidación: un valor cargado antes no debe guardarse después
+        self.epoca = 0
+        self._stats = {'aciertos': 0, 'fallos': 0, 'expiradas': 0, 'expulsadas': 0, 'invalidaciones': 0}
+
+    def obtener(self, clave):
+        """Devuelve (True, valor) si la clave está vigente, (False, None) si no"""
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                caduca, valor = entrada
+                if caduca > ahora:
+                    self._datos.move_to_end(clave)
+                    self._stats['aciertos'] += 1
+                    return True, valor
+                del self._datos[clave]
+                self._stats['expiradas'] += 1
+            self._stats['fallos'] += 1
+            return False, None
+
+    def guardar(self, clave, valor, epoca=None):
+        with self._lock:
+            if epoca is not None and epoca != self.epoca:
+                return
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+                self._stats['expulsadas'] += 1
+
+    def invalidar(self):
+        with self._lock:
+            self._datos.clear()
+            self.epoca += 1
+            self._stats['invalidaciones'] += 1
+
+    def estadisticas(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entradas'] = len(self._datos)
+            stats['max_entradas'] = self.max_entradas
+            stats['ttl'] = self.ttl
+        return stats
+
+
+class GeneracionCompartida:
+    """Contador en la tabla cache_generaciones que cada escritura incrementa.
+
+    Cada worker lo consulta como mucho una vez por `intervalo` segundos y
+    vacía su caché local cuando cambia.
+    """
+
+    CLAVE = 'catalogo'
+
+    def __init__(self, obtener_conexion, intervalo=1.0):
+        self.obtener_conexion = obtener_conexion
+        self.intervalo = intervalo
+        self._valor = None
+        self._leido = 0.0
+        self._lock = threading.Lock()
+
+    def leer(self):
+        ahora = time.monotonic()
+        if ahora - self._leido < self.intervalo:
+            return self._valor
+        with self._lock:
+            if ahora - self._leido < self.intervalo:
+                return self._valor
+            self._leido = ahora
+            conn = self.obtener_conexion()
+            if not conn:
+                return self._valor
+            try:
+                cursor = conn.cursor()
+                cursor.execute("SELECT valor FROM cache_generaciones WHERE clave = %s", (self.CLAVE,))
+                fila = cursor.fetchone()
+                cursor.close()
+                self._valor = fila[0] if fila else 0
+            except mysql.connector.Error:
+                pass
+            finally:
+                conn.close()
+            return self._valor
+
+    def incrementar(self, cursor):
+        """Se ejecuta dentro de la transacción de la escritura"""
+        cursor.execute(
+            """INSERT INTO cache_generaciones (clave, valor) VALUES (%s, 1)
+            ON DUPLICATE KEY UPDATE valor = valor + 1""",
+            (self.CLAVE,)
+        )
+
+
+class CacheCatalogo:
+    """Lecturas del catálogo con carga perezosa (read-through).
+
+    `version` cuenta los cambios del catálogo vistos por este worker: sube con
+    cada invalidación (escrituras propias y, con la generación compartida, las
+    de los demás). Sin la generación compartida las escrituras de otros
+    procesos solo se notan al caducar las entradas (TTL), así que nada cacheado
+    aquí, tampoco un ETag, vive más que eso.
+    """
+
+    def __init__(self, lru, compartida=None):
+        self.lru = lru
+        self.compartida = compartida
+        self._generacion = None
+        # Último valor cargado de cada clave en esta versión; solo se compara con
+        # la recarga (no se sirve), así que no caduca
+        self._anteriores = CacheLRU(lru.max_entradas, float('inf'))
+
+    @property
+    def version(self):
+        return self._anteriores.epoca
+
+    def _sincronizar(self):
+        if self.compartida is None:
+            return
+        generacion = self.compartida.leer()
+        if generacion != self._generacion:
+            if self._generacion is not None:
+                self.invalidar()
+            self._generacion = generacion
+
+    def obtener(self, clave, cargador):
+        """Devuelve el valor cacheado o lo calcula con `cargador()` y lo guarda.
+
+        Un cargador que devuelve None (sin conexión) no deja nada en caché.
+        Los valores se comparten entre peticiones: no deben modificarse.
+        """
+        self._sincronizar()
+        encontrado, valor = self.lru.obtener(clave)
+        if encontrado:
+            return valor
+        epoca, version = self.lru.epoca, self.version
+        valor = cargador()
+        if valor is not None:
+            self.lru.guardar(clave, valor, epoca)
+            self._anteriores.guardar(clave, valor, version)
+        return valor
+
+    def anterior(self, clave):
+        """Último valor cargado de `clave` en esta versión (aunque haya caducado), o None.
+
+        Sirve para comparar con una recarga, no para responder con él: puede
+        estar desactualizado por escrituras de otros procesos.
+        """
+        return self._anteriores.obtener(clave)[1]
+
+    def registrar_escritura(self, cursor):
+        """Marca el cambio para el resto de workers (en la transacción de la escritura)"""
+        if self.compartida is not None:
+            self.compartida.incrementar(cursor)
+
+    def invalidar(self):
+        """Vacía la caché local y sube la versión; llamar después del commit de la escritura"""
+        self.lru.invalidar()
+        self._anteriores.invalidar()
+
+    def estadisticas(self):
+        stats = self.lru.estadisticas()
+        stats['compartida'] = self.compartida is not None
+        stats['generacion'] = self._generacion
+        stats['version'] = self.version
+        return stats
+
+
+class RespuestaSerializada:
+    """Cuerpo JSON ya serializado de una lectura cacheada, con su ETag.
+
+    Se construye una vez por versión del catálogo (la caché se invalida en
+    cada escritura), así que el hash y la compresión no se repiten entre
+    peticiones. El ETag depende solo del contenido: coincide entre workers.
+    Si `anterior` tiene el mismo contenido se conserva su fecha de
+    modificación (una recarga por TTL no cambia Last-Modified).
+    """
+
+    def __init__(self, cuerpo, enlaces='', comprimir=True, minimo_gzip=1024, anterior=None):
+        self.cuerpo = cuerpo
+        self.enlaces = enlaces
+        self.etag = hashlib.sha1(cuerpo).hexdigest()
+        if anterior is not None and anterior.etag == self.etag:
+            self.modificado = anterior.modificado
+        else:
+            self.modificado = datetime.now(timezone.utc).replace(microsecond=0)
+        self.gzip = None
+        if comprimir and len(cuerpo) >= minimo_gzip:
+            self.gzip = gzip.compress(cuerpo, compresslevel=6, mtime=0)
@@ -0,0 +1,107 @@
+"""Cortacircuitos para el acceso a la base de datos.
+
+Con `umbral_fallos` fallos en `espera` segundos (conexión rechazada o
+perdida) el circuito se abre y las peticiones fallan al instante en lugar de
+esperar cada una su timeout. Pasados `espera` segundos deja pasar una única
+conexión de prueba (semiabierto): si sale bien se cierra de nuevo y si falla
+vuelve a abrirse.
+
+Un pool agotado, un interbloqueo o una consulta cortada por
+max_execution_time no cuentan como fallo: el servidor responde, y abrir el
+circuito solo convertiría un pico de carga en una caída total.
+"""
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+
+CERRADO = 'cerrado'
+ABIERTO = 'abierto'
+SEMIABIERTO = 'semiabierto'
+
+# Códigos de error de conexión: servidor inalcanzable o conexión perdida
+ERRORES_SERVIDOR = (
+    2002,  # CR_CONNECTION_ERROR
+    2003,  # CR_CONN_HOST_ERROR: conexión rechazada o timeout al conectar
+    2005,  # CR_UNKNOWN_HOST
+    2006,  # CR_SERVER_GONE_ERROR
+    2013,  # CR_SERVER_LOST
+    2055,  # CR_SERVER_LOST_EXTENDED
+)
+
+
+class CircuitoAbierto(mysql.connector.Error):
+    """La base de datos se da por caída: no se intenta conectar"""
+
+
+def es_fallo_de_servidor(err):
+    """Error a nivel de conexión (no del SQL, de los datos, de bloqueos ni del pool local)"""
+    return getattr(err, 'errno', None) in ERRORES_SERVIDOR
+
+
+class Circuito:
+    """Estado del cortacircuitos, compartido por todos los hilos del worker"""
+
+    def __init__(self, umbral_fallos=5, espera=10.0):
+        self.umbral_fallos = umbral_fallos
+        self.espera = espera
+        self.estado = CERRADO
+        self._fallos = deque()
+        self._abierto_en = 0.0
+        self._sondeando = False
+        self._sondeo_de = None
+        self._lock = threading.Lock()
+        self._stats = {'aperturas': 0, 'rechazadas': 0, 'fallos': 0}
+
+    def permitir(self):
+        """True si se puede intentar usar la base de datos"""
+        with self._lock:
+            if self.estado == CERRADO:
+                return True
+            if self.estado == ABIERTO and time.monotonic() - self._abierto_en >= self.espera:
+                self.estado = SEMIABIERTO
+            if self.estado == SEMIABIERTO and not self._sondeando:
+                self._sondeando = True
+                self._sondeo_de = threading.get_ident()
+                return True
+            self._stats['rechazadas'] += 1
+            return False
+
+    def exito(self):
+        """Una conexión salió bien; solo cambia el estado si era la de prueba"""
+        with self._lock:
+            if self.estado == SEMIABIERTO:
+                self.estado = CERRADO
+                self._fallos.clear()
+                self._sondeando = False
+
+    def soltar_sondeo(self):
+        """Libera la prueba de este hilo si acabó sin exito() ni fallo() (p. ej. error de acceso).
+
+        El circuito sigue semiabierto y la siguiente petición hace otra prueba.
+        """
+        with self._lock:
+            if self._sondeando and self._sondeo_de == threading.get_ident():
+                self._sondeando = False
+                self._sondeo_de = None
+
+    def fallo(self):
+        ahora = time.monotonic()
+        with self._lock:
+            self._stats['fallos'] += 1
+            self._fallos.append(ahora)
+            while self._fallos and ahora - self._fallos[0] > self.espera:
+                self._fallos.popleft()
+            if self.estado == SEMIABIERTO or (self.estado == CERRADO and len(self._fallos) >= self.umbral_fallos):
+                self.estado = ABIERTO
+                self._abierto_en = ahora
+                self._sondeando = False
+                self._stats['aperturas'] += 1
+
+    def estadisticas(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['estado'] = self.estado
+            stats['fallos_recientes'] = len(self._fallos)
+        return stats
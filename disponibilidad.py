@@ -0,0 +1,256 @@
+"""Cambios de disponibilidad de libros difundidos por Server-Sent Events.
+
+Cada escritura que cambia ejemplares_disponibles deja filas en
+eventos_disponibilidad dentro de su propia transacción (patrón outbox). Un
+hilo por worker lee los eventos nuevos con una sola consulta por intervalo y
+los reparte a todos los clientes conectados.
+
+El id de evento que ven los clientes es el `lote` de la fila, no su id
+AUTO_INCREMENT: InnoDB deja huecos permanentes en este (rollbacks, INSERT ...
+SELECT de varias filas) y asigna los ids antes del commit. El lote sale de
+un contador en la tabla secuencias que se incrementa dentro de la misma
+transacción, así que su bloqueo de fila se mantiene hasta el commit: un lote
+solo se asigna cuando el anterior ya se confirmó (o se deshizo, y entonces
+se reutiliza). Si el difusor ve un lote, ve también todos los anteriores, y
+puede entregar en orden sin esperar a que se llenen los huecos.
+
+Para acortar ese bloqueo, los eventos se insertan con un lote provisional
+(-CONNECTION_ID(), único entre las transacciones abiertas e invisible para
+el difusor) y `sellar()` toma el contador y numera los eventos como últimas
+sentencias antes del commit. Aun así el coste es real: las transacciones
+que registran eventos se confirman de una en una, sin group commit entre
+ellas, y su rendimiento máximo es del orden de 1 / latencia del commit
+(unas 1000 por segundo con un fsync de 1 ms), aunque toquen libros distintos.
+"""
+import json
+import logging
+import threading
+from collections import deque
+
+import mysql.connector
+
+logger = logging.getLogger('biblioteca.disponibilidad')
+
+TAMANO_BUFFER = 10000
+TAMANO_SONDEO = 1000
+SECUENCIA = 'eventos_disponibilidad'
+# Lote de los eventos de esta transacción hasta que se sellan
+LOTE_PROVISIONAL = '-CONNECTION_ID()'
+
+
+def sellar(cursor):
+    """Numera los eventos de esta transacción en orden de commit.
+
+    Bloquea el contador hasta el commit, así que debe ser lo último antes de él.
+    """
+    cursor.execute("UPDATE secuencias SET valor = LAST_INSERT_ID(valor + 1) WHERE clave = %s", (SECUENCIA,))
+    cursor.execute(f"UPDATE eventos_disponibilidad SET lote = LAST_INSERT_ID() WHERE lote = {LOTE_PROVISIONAL}")
+
+
+def registrar(cursor, libro_ids):
+    """Anota la disponibilidad actual de los libros (llamar tras actualizarlos; `sellar()` antes del commit)"""
+    libro_ids = list(dict.fromkeys(libro_ids))
+    if not libro_ids:
+        return
+    marcadores = ', '.join(['%s'] * len(libro_ids))
+    cursor.execute(
+        f"""INSERT INTO eventos_disponibilidad (lote, libro_id, ejemplares_disponibles)
+        SELECT {LOTE_PROVISIONAL}, id, ejemplares_disponibles FROM libros WHERE id IN ({marcadores})""",
+        libro_ids
+    )
+
+
+def registrar_por_prestamos(cursor, prestamo_ids):
+    """Como registrar(), a partir de los préstamos devueltos"""
+    prestamo_ids = list(dict.fromkeys(prestamo_ids))
+    if not prestamo_ids:
+        return
+    marcadores = ', '.join(['%s'] * len(prestamo_ids))
+    cursor.execute(
+        f"""INSERT INTO eventos_disponibilidad (lote, libro_id, ejemplares_disponibles)
+        SELECT DISTINCT {LOTE_PROVISIONAL}, l.id, l.ejemplares_disponibles
+        FROM prestamos p JOIN libros l ON l.id = p.libro_id
+        WHERE p.id IN ({marcadores})""",
+        prestamo_ids
+    )
+
+
+def registrar_eliminado(cursor, libro_id):
+    cursor.execute(
+        f"INSERT INTO eventos_disponibilidad (lote, libro_id, ejemplares_disponibles) "
+        f"VALUES ({LOTE_PROVISIONAL}, %s, NULL)",
+        (libro_id,)
+    )
+
+
+def registrar_recarga(cursor):
+    """Cambio masivo (p. ej. importación): los clientes deben pedir una instantánea nueva"""
+    cursor.execute(
+        f"INSERT INTO eventos_disponibilidad (lote, libro_id, ejemplares_disponibles) "
+        f"VALUES ({LOTE_PROVISIONAL}, NULL, NULL)"
+    )
+
+
+def instantanea(cursor):
+    """Libros con ejemplares disponibles como pares [libro_id, ejemplares_disponibles]"""
+    cursor.execute("SELECT id, ejemplares_disponibles FROM libros WHERE ejemplares_disponibles > 0 ORDER BY id")
+    return [list(fila) for fila in cursor.fetchall()]
+
+
+def mensaje(evento, datos, evento_id=None):
+    """Serializa un mensaje en el formato de text/event-stream"""
+    lineas = []
+    if evento_id is not None:
+        lineas.append(f'id: {evento_id}')
+    lineas.append(f'event: {evento}')
+    lineas.append('data: ' + json.dumps(datos, separators=(',', ':')))
+    return '\n'.join(lineas) + '\n\n'
+
+
+def mensaje_evento(fila):
+    evento_id, libro_id, disponibles = fila
+    if libro_id is None:
+        return mensaje('recarga', {}, evento_id)
+    return mensaje('disponibilidad', {'libro_id': libro_id, 'ejemplares_disponibles': disponibles}, evento_id)
+
+
+class Difusor:
+    """Hilo que sondea la tabla de eventos y despierta a los clientes suscritos"""
+
+    def __init__(self, obtener_conexion, intervalo=1.0, tamano_buffer=TAMANO_BUFFER, retencion_horas=24):
+        self.obtener_conexion = obtener_conexion
+        self.intervalo = intervalo
+        self.retencion_horas = retencion_horas
+        # Último lote entregado: es el id de evento de los clientes
+        self.ultimo_id = None
+        # Los clientes en un id >= _base pueden reanudar desde el buffer
+        self._base = None
+        self.clientes = 0
+        self._oyentes = []
+        self._eventos = deque(maxlen=tamano_buffer)
+        self._cond = threading.Condition()
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._ejecutar, name='difusor-disponibilidad', daemon=True)
+
+    def iniciar(self):
+        """Lee el último lote existente (los clientes empiezan a partir de ahí) y arranca el hilo"""
+        conn = self.obtener_conexion()
+        if not conn:
+            raise mysql.connector.InterfaceError('Sin conexión para iniciar el difusor')
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COALESCE(MAX(lote), 0) FROM eventos_disponibilidad")
+            self.ultimo_id = self._base = cursor.fetchone()[0]
+            cursor.close()
+        finally:
+            conn.close()
+        self._hilo.start()
+
+    def escuchar(self, funcion):
+        """Registra `funcion(eventos)`, llamada desde el hilo del difusor con cada tanda nueva"""
+        self._oyentes.append(funcion)
+
+    def detener(self):
+        self._parar.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def puede_reanudar(self, desde_id):
+        """True si todos los eventos posteriores a `desde_id` siguen en el buffer"""
+        with self._cond:
+            return self._base <= desde_id <= self.ultimo_id
+
+    def esperar(self, desde_id, timeout):
+        """Eventos con id > desde_id, esperando hasta `timeout` si no hay ninguno.
+
+        Devuelve None si alguno ya salió del buffer (el cliente debe recargar).
+        """
+        with self._cond:
+            if self.ultimo_id <= desde_id:
+                self._cond.wait(timeout)
+            if self.ultimo_id <= desde_id:
+                return []
+            if desde_id < self._base:
+                return None
+            return [evento for evento in self._eventos if evento[0] > desde_id]
+
+    def _ejecutar(self):
+        sondeos = 0
+        while not self._parar.wait(self.intervalo):
+            conn = self.obtener_conexion()
+            if not conn:
+                continue
+            try:
+                cursor = conn.cursor()
+                nuevos = self._leer_nuevos(cursor)
+                sondeos += 1
+                # Limpieza de eventos antiguos más o menos una vez por hora
+                if self.retencion_horas and sondeos * self.intervalo >= 3600:
+                    sondeos = 0
+                    cursor.execute(
+                        "DELETE FROM eventos_disponibilidad WHERE creado < NOW() - INTERVAL %s HOUR LIMIT 10000",
+                        (self.retencion_horas,)
+                    )
+                    conn.commit()
+                cursor.close()
+            except mysql.connector.Error as err:
+                logger.error("❌ Error al leer eventos de disponibilidad: %s", err)
+                continue
+            finally:
+                conn.close()
+
+            aceptados = [tuple(fila) for fila in nuevos]
+            if aceptados:
+                with self._cond:
+                    sobran = len(self._eventos) + len(aceptados) - self._eventos.maxlen
+                    if sobran > 0:
+                        self._base = (self._eventos[sobran - 1] if sobran <= len(self._eventos)
+                                      else aceptados[sobran - len(self._eventos) - 1])[0]
+                    self._eventos.extend(aceptados)
+                    self.ultimo_id = aceptados[-1][0]
+                    self._cond.notify_all()
+                for oyente in self._oyentes:
+                    oyente(aceptados)
+
+    def _leer_nuevos(self, cursor):
+        """Eventos de los lotes posteriores al último entregado, siempre con lotes completos"""
+        cursor.execute(
+            "SELECT lote, libro_id, ejemplares_disponibles FROM eventos_disponibilidad "
+            "WHERE lote > %s ORDER BY lote, id LIMIT %s",
+            (self.ultimo_id, TAMANO_SONDEO)
+        )
+        filas = cursor.fetchall()
+        if len(filas) < TAMANO_SONDEO:
+            return filas
+        # El límite puede cortar el último lote: se deja para el siguiente sondeo
+        ultimo_lote = filas[-1][0]
+        completos = [fila for fila in filas if fila[0] != ultimo_lote]
+        if completos:
+            return completos
+        # Un solo lote más grande que el sondeo: se lee entero
+        cursor.execute(
+            "SELECT lote, libro_id, ejemplares_disponibles FROM eventos_disponibilidad "
+            "WHERE lote = %s ORDER BY id",
+            (ultimo_lote,)
+        )
+        return cursor.fetchall()
+
+    def suscribir(self, desde_id, latido=15.0):
+        """Generador de mensajes SSE para un cliente a partir de `desde_id`"""
+        with self._cond:
+            self.clientes += 1
+        try:
+            while not self._parar.is_set():
+                eventos = self.esperar(desde_id, latido)
+                if eventos is None:
+                    yield mensaje('recarga', {})
+                    return
+                if not eventos:
+                    # Comentario SSE: mantiene viva la conexión a través de proxies
+                    yield ': latido\n\n'
+                    continue
+                yield ''.join(mensaje_evento(evento) for evento in eventos)
+                desde_id = eventos[-1][0]
+        finally:
+            with self._cond:
+                self.clientes -= 1
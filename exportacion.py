@@ -0,0 +1,75 @@
+"""Exportación en streaming (CSV / NDJSON) con un cursor sin buffer.
+
+Las filas se leen del servidor por bloques a medida que se envían al
+cliente, de modo que la memoria del worker no depende del tamaño del
+resultado y los primeros bytes salen de inmediato.
+"""
+import csv
+import io
+import json
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+TAMANO_BLOQUE = 1000
+
+
+def _bloque_csv(filas):
+    salida = io.StringIO()
+    csv.writer(salida).writerows(filas)
+    return salida.getvalue()
+
+
+def _bloque_ndjson(columnas, filas):
+    return ''.join(
+        json.dumps(dict(zip(columnas, fila)), default=str, ensure_ascii=False) + '\n'
+        for fila in filas
+    )
+
+
+def generar(conn, query, params, formato, tamano_bloque=TAMANO_BLOQUE):
+    """Genera el resultado de `query` serializado por bloques.
+
+    Se queda con la conexión: al terminar (o si el cliente corta la descarga)
+    la descarta en lugar de devolverla al pool, para no tener que leer el
+    resto del resultado ni arrastrar el cambio de max_execution_time.
+    """
+    try:
+        cursor = conn.cursor()
+        # Una exportación completa puede superar el límite de lectura del pool
+        cursor.execute("SET SESSION max_execution_time = 0")
+        cursor.execute(query, params)
+        columnas = [descripcion[0] for descripcion in cursor.description]
+        if formato == 'csv':
+            yield _bloque_csv([columnas])
+
+        while True:
+            filas = cursor.fetchmany(tamano_bloque)
+            if not filas:
+                break
+            if formato == 'csv':
+                yield _bloque_csv(filas)
+            else:
+                yield _bloque_ndjson(columnas, filas)
+    finally:
+        conn.descartar()
+
+
+def iniciar(conn, query, params, formato):
+    """Lanza la consulta antes de enviar las cabeceras y devuelve el resto como generador.
+
+    Así un error de base de datos todavía puede notificarse con un flash en
+    lugar de cortar una descarga ya empezada.
+    """
+    bloques = generar(conn, query, params, formato)
+    try:
+        primero = next(bloques)
+    except StopIteration:
+        primero = ''
+
+    def contenido():
+        yield primero
+        yield from bloques
+
+    return contenido()
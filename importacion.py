@@ -0,0 +1,194 @@
+"""Importación masiva del catálogo desde CSV o JSONL.
+
+El archivo se lee fila a fila, cada fila se valida con las mismas reglas
+que el formulario de alta y las válidas se insertan en sentencias
+multi-fila con commits periódicos. Un ISBN repetido actualiza el libro
+existente en lugar de fallar, salvo que lo deje con menos ejemplares que
+préstamos abiertos: esa fila se rechaza como en el formulario de edición.
+"""
+import csv
+import io
+import json
+import time
+
+import mysql.connector
+
+import resumen
+from validacion import validar_libro
+
+COLUMNAS = ('titulo', 'autor', 'isbn', 'genero', 'anio_publicacion', 'editorial', 'ejemplares')
+MAX_RECHAZOS_DETALLE = 100
+
+# Las asignaciones de ON DUPLICATE KEY UPDATE se evalúan en orden: los
+# disponibles se ajustan con el número de ejemplares anterior. Las filas que
+# dejarían menos ejemplares que préstamos abiertos se rechazan antes.
+SQL_UPSERT = """INSERT INTO libros
+    (titulo, autor, isbn, genero, anio_publicacion, editorial, ejemplares, ejemplares_disponibles)
+    VALUES {valores}
+    ON DUPLICATE KEY UPDATE
+        titulo = VALUES(titulo),
+        autor = VALUES(autor),
+        genero = VALUES(genero),
+        anio_publicacion = VALUES(anio_publicacion),
+        editorial = VALUES(editorial),
+        ejemplares_disponibles = ejemplares_disponibles + VALUES(ejemplares) - ejemplares,
+        ejemplares = VALUES(ejemplares)"""
+
+
+def detectar_formato(nombre):
+    nombre = (nombre or '').lower()
+    if nombre.endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    return 'csv'
+
+
+def leer_filas(archivo, formato):
+    """Genera (número de línea, datos) desde un archivo de texto sin cargarlo entero"""
+    if formato == 'jsonl':
+        for numero, linea in enumerate(archivo, start=1):
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                datos = json.loads(linea)
+            except ValueError:
+                yield numero, None
+                continue
+            yield numero, datos if isinstance(datos, dict) else None
+    else:
+        lector = csv.DictReader(archivo)
+        while True:
+            try:
+                datos = next(lector)
+            except StopIteration:
+                return
+            except csv.Error:
+                # Una línea malformada (p. ej. un campo demasiado largo) se rechaza sin abortar
+                # el resto; DictReader solo actualiza su line_num tras una fila válida
+                yield lector.reader.line_num, None
+                continue
+            yield lector.line_num, datos
+
+
+def abrir_texto(binario):
+    """Envuelve un flujo binario (p. ej. un archivo subido) como texto UTF-8"""
+    return io.TextIOWrapper(binario, encoding='utf-8-sig', newline='')
+
+
+class ResultadoImportacion:
+    def __init__(self):
+        self.leidas = 0
+        self.importadas = 0
+        self.rechazadas = 0
+        self.errores = []
+        self.inicio = time.monotonic()
+        self.duracion = 0.0
+
+    def rechazar(self, linea, mensaje):
+        self.rechazadas += 1
+        if len(self.errores) < MAX_RECHAZOS_DETALLE:
+            self.errores.append((linea, mensaje))
+
+    @property
+    def filas_por_segundo(self):
+        transcurrido = self.duracion or (time.monotonic() - self.inicio)
+        return self.leidas / transcurrido if transcurrido > 0 else 0.0
+
+    def como_dict(self):
+        return {
+            'leidas': self.leidas,
+            'importadas': self.importadas,
+            'rechazadas': self.rechazadas,
+            'errores': [{'linea': linea, 'error': mensaje} for linea, mensaje in self.errores],
+            'duracion': round(self.duracion, 3),
+            'filas_por_segundo': round(self.filas_por_segundo, 1),
+        }
+
+
+def _rechazar_reducciones(cursor, lote, resultado):
+    """Quita del lote las filas que reducen un libro existente por debajo de sus préstamos"""
+    isbns = list({libro['isbn'] for _, libro in lote if libro['isbn']})
+    if not isbns:
+        return lote
+    marcadores = ', '.join(['%s'] * len(isbns))
+    # Bloquea los libros hasta el commit para que nadie preste entre la comprobación y el upsert
+    cursor.execute(f"SELECT isbn, ejemplares - ejemplares_disponibles FROM libros "
+                   f"WHERE isbn IN ({marcadores}) FOR UPDATE", isbns)
+    prestados = dict(cursor.fetchall())
+    validas = []
+    for linea, libro in lote:
+        if libro['ejemplares'] < prestados.get(libro['isbn'], 0):
+            resultado.rechazar(linea, 'No puede reducir ejemplares por debajo de los prestados')
+        else:
+            validas.append((linea, libro))
+    return validas
+
+
+def _insertar_lote(cursor, lote):
+    valores = ', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s)'] * len(lote))
+    params = []
+    for _, libro in lote:
+        params.extend([libro[columna] for columna in COLUMNAS])
+        params.append(libro['ejemplares'])
+    cursor.execute(SQL_UPSERT.format(valores=valores), params)
+
+
+def importar(conn, filas, tamano_lote=1000, filas_por_commit=20000, progreso=None):
+    """Importa las filas de `leer_filas` y devuelve un ResultadoImportacion.
+
+    `progreso`, si se indica, se llama con el resultado parcial tras cada commit.
+    """
+    resultado = ResultadoImportacion()
+    cursor = conn.cursor()
+    lote = []
+    pendientes = 0
+
+    def volcar():
+        nonlocal pendientes
+        pendientes += len(lote)
+        validas = _rechazar_reducciones(cursor, lote, resultado)
+        try:
+            if validas:
+                _insertar_lote(cursor, validas)
+                resultado.importadas += len(validas)
+        except mysql.connector.Error:
+            # Una fila que MySQL no acepta invalida la sentencia: se reintenta de una en una
+            for fila in validas:
+                try:
+                    _insertar_lote(cursor, [fila])
+                    resultado.importadas += 1
+                except mysql.connector.Error as err:
+                    resultado.rechazar(fila[0], err.msg)
+        lote.clear()
+        if pendientes >= filas_por_commit:
+            conn.commit()
+            pendientes = 0
+            if progreso:
+                progreso(resultado)
+
+    for linea, datos in filas:
+        resultado.leidas += 1
+        if datos is None:
+            resultado.rechazar(linea, 'Fila con formato inválido')
+            continue
+        libro, error = validar_libro(datos)
+        if error:
+            resultado.rechazar(linea, error)
+            continue
+        lote.append((linea, libro))
+        if len(lote) >= tamano_lote:
+            volcar()
+
+    if lote:
+        volcar()
+    conn.commit()
+
+    # Los contadores del panel se recalculan una vez al final
+    resumen.sincronizar_libros(cursor)
+    conn.commit()
+    cursor.close()
+
+    resultado.duracion = time.monotonic() - resultado.inicio
+    if progreso:
+        progreso(resultado)
+    return resultado
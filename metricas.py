@@ -0,0 +1,201 @@
+"""Métricas de la aplicación en formato de exposición de Prometheus.
+
+Incluye un envoltorio de cursor que mide cada consulta (latencia, filas
+devueltas, consultas por ruta) y registra las lentas con su forma SQL.
+"""
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger('biblioteca.sql')
+
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+def _etiquetas(etiquetas):
+    if not etiquetas:
+        return ''
+    partes = []
+    for nombre, valor in etiquetas:
+        valor = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        partes.append(f'{nombre}="{valor}"')
+    return '{' + ','.join(partes) + '}'
+
+
+class Contador:
+    tipo = 'counter'
+
+    def __init__(self, nombre, ayuda):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, valor=1, **etiquetas):
+        clave = tuple(sorted(etiquetas.items()))
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + valor
+
+    def exponer(self):
+        with self._lock:
+            valores = sorted(self._valores.items())
+        return [f'{self.nombre}{_etiquetas(clave)} {valor}' for clave, valor in valores]
+
+
+class Histograma:
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, buckets=BUCKETS_SEGUNDOS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor, **etiquetas):
+        clave = tuple(sorted(etiquetas.items()))
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * len(self.buckets), 0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[0][i] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def exponer(self):
+        with self._lock:
+            series = sorted((clave, (list(s[0]), s[1], s[2])) for clave, s in self._series.items())
+        lineas = []
+        for clave, (conteos, suma, total) in series:
+            for limite, conteo in zip(self.buckets, conteos):
+                lineas.append(f'{self.nombre}_bucket{_etiquetas(clave + (("le", limite),))} {conteo}')
+            lineas.append(f'{self.nombre}_bucket{_etiquetas(clave + (("le", "+Inf"),))} {total}')
+            lineas.append(f'{self.nombre}_sum{_etiquetas(clave)} {suma}')
+            lineas.append(f'{self.nombre}_count{_etiquetas(clave)} {total}')
+        return lineas
+
+
+class Registro:
+    """Conjunto de métricas de la aplicación"""
+
+    def __init__(self, umbral_lenta=0.2):
+        self.umbral_lenta = umbral_lenta
+        self.consultas = Contador('biblioteca_consultas_total', 'Consultas SQL ejecutadas por ruta')
+        self.duracion_consulta = Histograma('biblioteca_consulta_duracion_segundos',
+                                            'Latencia de cada consulta SQL por ruta')
+        self.filas = Contador('biblioteca_filas_devueltas_total', 'Filas leídas de la base de datos por ruta')
+        self.consultas_lentas = Contador('biblioteca_consultas_lentas_total',
+                                         'Consultas por encima del umbral de lentitud')
+        self.consultas_por_peticion = Histograma('biblioteca_consultas_por_peticion',
+                                                 'Número de consultas SQL por petición', BUCKETS_CONSULTAS)
+        self.espera_conexion = Histograma('biblioteca_conexion_espera_segundos',
+                                          'Tiempo para obtener una conexión del pool por ruta')
+        self.duracion_plantilla = Histograma('biblioteca_plantilla_duracion_segundos',
+                                             'Tiempo de renderizado por plantilla')
+        self.peticiones = Contador('biblioteca_peticiones_total', 'Peticiones HTTP por ruta y código')
+        self.duracion_peticion = Histograma('biblioteca_peticion_duracion_segundos',
+                                            'Duración de las peticiones HTTP por ruta')
+
+    def metricas(self):
+        return [valor for valor in vars(self).values() if isinstance(valor, (Contador, Histograma))]
+
+    def exponer(self, extra=None):
+        """Texto en formato Prometheus; `extra` son (nombre, ayuda, valor) de tipo gauge"""
+        lineas = []
+        for metrica in self.metricas():
+            lineas.append(f'# HELP {metrica.nombre} {metrica.ayuda}')
+            lineas.append(f'# TYPE {metrica.nombre} {metrica.tipo}')
+            lineas.extend(metrica.exponer())
+        for nombre, ayuda, valor in extra or ():
+            lineas.append(f'# HELP {nombre} {ayuda}')
+            lineas.append(f'# TYPE {nombre} gauge')
+            lineas.append(f'{nombre} {valor}')
+        return '\n'.join(lineas) + '\n'
+
+
+_LITERALES = re.compile(r"'(?:[^'\\]|\\.)*'|\b\d+(?:\.\d+)?\b")
+_LISTAS = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+_ESPACIOS = re.compile(r'\s+')
+
+
+def forma_sql(sql):
+    """Normaliza la consulta para agrupar: sin literales, listas IN ni espacios repetidos"""
+    forma = _LITERALES.sub('?', sql)
+    forma = _LISTAS.sub('(...)', forma)
+    return _ESPACIOS.sub(' ', forma).strip()
+
+
+class CursorInstrumentado:
+    """Envuelve un cursor de mysql.connector midiendo ejecuciones y filas leídas"""
+
+    def __init__(self, cursor, registro, ruta, al_fallar=None):
+        self._cursor = cursor
+        self._registro = registro
+        self._ruta = ruta
+        # Se llama con la excepción si la consulta falla
+        self._al_fallar = al_fallar
+
+    def _medir(self, metodo, operacion, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return metodo(operacion, *args, **kwargs)
+        except Exception as err:
+            if self._al_fallar is not None:
+                self._al_fallar(err)
+            raise
+        finally:
+            duracion = time.perf_counter() - inicio
+            self._registro.consultas.incrementar(ruta=self._ruta)
+            self._registro.duracion_consulta.observar(duracion, ruta=self._ruta)
+            _local.consultas = getattr(_local, 'consultas', 0) + 1
+            if duracion >= self._registro.umbral_lenta:
+                self._registro.consultas_lentas.incrementar(ruta=self._ruta)
+                logger.warning('Consulta lenta (%.0f ms) en %s: %s',
+                               duracion * 1000, self._ruta, forma_sql(operacion))
+
+    def execute(self, operacion, *args, **kwargs):
+        return self._medir(self._cursor.execute, operacion, *args, **kwargs)
+
+    def executemany(self, operacion, *args, **kwargs):
+        return self._medir(self._cursor.executemany, operacion, *args, **kwargs)
+
+    def _filas(self, cantidad):
+        if cantidad:
+            self._registro.filas.incrementar(cantidad, ruta=self._ruta)
+
+    def fetchone(self):
+        fila = self._cursor.fetchone()
+        self._filas(1 if fila is not None else 0)
+        return fila
+
+    def fetchmany(self, *args, **kwargs):
+        filas = self._cursor.fetchmany(*args, **kwargs)
+        self._filas(len(filas))
+        return filas
+
+    def fetchall(self):
+        filas = self._cursor.fetchall()
+        self._filas(len(filas))
+        return filas
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+
+# Consultas del hilo actual: cada petición se atiende en un único hilo
+_local = threading.local()
+
+
+def reiniciar_contador():
+    _local.consultas = 0
+
+
+def consultas_en_hilo():
+    return getattr(_local, 'consultas', 0)
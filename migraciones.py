@@ -0,0 +1,442 @@
+"""Migraciones versionadas del esquema.
+
+Cada migración tiene un número de versión y una función idempotente que
+recibe un cursor; el ejecutor aplica en orden las que no figuren en
+schema_migraciones y las registra. Se lanzan con `flask migrar`, nunca al
+importar la aplicación.
+
+Cada migración es SQL propio, sin llamar a los módulos de la aplicación:
+tiene que poder repetirse en una base nueva aunque ese código cambie después.
+"""
+
+BLOQUEO = 'biblioteca_migraciones'
+
+
+def asegurar_columna(cursor, tabla, nombre, definicion):
+    """Añade la columna a la tabla si todavía no existe"""
+    cursor.execute(
+        """SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s""",
+        (tabla, nombre)
+    )
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(f"ALTER TABLE {tabla} ADD COLUMN {nombre} {definicion}")
+
+
+def asegurar_indice(cursor, tabla, nombre, definicion):
+    """Añade el índice a la tabla si todavía no existe"""
+    cursor.execute(
+        """SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s""",
+        (tabla, nombre)
+    )
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(f"ALTER TABLE {tabla} ADD {definicion}")
+
+
+def _001_tablas_base(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS libros (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            titulo VARCHAR(255) NOT NULL,
+            autor VARCHAR(255) NOT NULL,
+            isbn VARCHAR(20) UNIQUE,
+            genero VARCHAR(100),
+            anio_publicacion INT,
+            editorial VARCHAR(255),
+            ejemplares INT DEFAULT 1,
+            ejemplares_disponibles INT DEFAULT 1,
+            fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS prestamos (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            libro_id INT,
+            nombre_prestatario VARCHAR(255) NOT NULL,
+            email_prestatario VARCHAR(255),
+            telefono VARCHAR(20),
+            fecha_prestamo DATE NOT NULL,
+            fecha_devolucion DATE,
+            fecha_devolucion_real DATE,
+            estado ENUM('prestado', 'devuelto', 'atrasado') DEFAULT 'prestado',
+            observaciones TEXT,
+            FOREIGN KEY (libro_id) REFERENCES libros(id) ON DELETE CASCADE
+        )
+    ''')
+
+
+def _002_busqueda_catalogo(cursor):
+    asegurar_indice(cursor, 'libros', 'ft_libros_catalogo',
+                    'FULLTEXT INDEX ft_libros_catalogo (titulo, autor, editorial)')
+
+
+def _003_contadores_panel(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS resumen_contadores (
+            clave VARCHAR(50) PRIMARY KEY,
+            valor BIGINT NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS resumen_libros (
+            libro_id INT PRIMARY KEY,
+            total_prestamos INT NOT NULL DEFAULT 0,
+            INDEX idx_resumen_libros_total (total_prestamos),
+            FOREIGN KEY (libro_id) REFERENCES libros(id) ON DELETE CASCADE
+        )
+    ''')
+    # Carga inicial desde los datos existentes (el archivo aún no existe en esta versión)
+    cursor.execute("SELECT COUNT(*) FROM resumen_contadores")
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(
+            """INSERT INTO resumen_contadores (clave, valor)
+            SELECT 'total_libros', COUNT(*) FROM libros
+            UNION ALL
+            SELECT 'prestamos_activos', COUNT(*) FROM prestamos WHERE estado = 'prestado'
+            UNION ALL
+            SELECT 'prestamos_atrasados', COUNT(*) FROM prestamos WHERE estado = 'atrasado'"""
+        )
+        cursor.execute("DELETE FROM resumen_libros")
+        cursor.execute(
+            """INSERT INTO resumen_libros (libro_id, total_prestamos)
+            SELECT l.id, COUNT(p.id)
+            FROM libros l
+            LEFT JOIN prestamos p ON l.id = p.libro_id
+            GROUP BY l.id"""
+        )
+
+
+def _004_barrido_atrasos(cursor):
+    asegurar_indice(cursor, 'prestamos', 'idx_prestamos_estado_devolucion',
+                    'INDEX idx_prestamos_estado_devolucion (estado, fecha_devolucion)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS barridos_atrasados (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            inicio DATETIME NOT NULL,
+            duracion_ms INT NOT NULL,
+            filas INT NOT NULL,
+            lotes INT NOT NULL
+        )
+    ''')
+
+
+def _005_indices_consultas(cursor):
+    # index() y listar_prestamos sin filtro: ORDER BY fecha_prestamo DESC, id DESC
+    asegurar_indice(cursor, 'prestamos', 'idx_prestamos_fecha',
+                    'INDEX idx_prestamos_fecha (fecha_prestamo, id)')
+    # listar_prestamos?estado=...: igualdad + mismo orden
+    asegurar_indice(cursor, 'prestamos', 'idx_prestamos_estado_fecha',
+                    'INDEX idx_prestamos_estado_fecha (estado, fecha_prestamo, id)')
+    # listar_libros y api_libros_disponibles: ORDER BY titulo, id
+    asegurar_indice(cursor, 'libros', 'idx_libros_titulo',
+                    'INDEX idx_libros_titulo (titulo, id)')
+    # listar_libros?genero=... y el SELECT DISTINCT genero del filtro
+    asegurar_indice(cursor, 'libros', 'idx_libros_genero_titulo',
+                    'INDEX idx_libros_genero_titulo (genero, titulo, id)')
+    # Búsqueda por prefijo de autor cuando el término es muy corto para FULLTEXT
+    asegurar_indice(cursor, 'libros', 'idx_libros_autor',
+                    'INDEX idx_libros_autor (autor)')
+
+
+def _006_cache_compartida(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cache_generaciones (
+            clave VARCHAR(50) PRIMARY KEY,
+            valor BIGINT NOT NULL DEFAULT 0
+        )
+    ''')
+
+
+def _007_eventos_disponibilidad(cursor):
+    # libro_id NULL: cambio masivo, los clientes deben pedir una instantánea
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS eventos_disponibilidad (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            libro_id INT,
+            ejemplares_disponibles INT,
+            creado TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_eventos_disponibilidad_creado (creado)
+        )
+    ''')
+
+
+def _008_archivo_prestamos(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS prestamos_archivo (
+            id INT PRIMARY KEY,
+            libro_id INT,
+            nombre_prestatario VARCHAR(255) NOT NULL,
+            email_prestatario VARCHAR(255),
+            telefono VARCHAR(20),
+            fecha_prestamo DATE NOT NULL,
+            fecha_devolucion DATE,
+            fecha_devolucion_real DATE,
+            estado ENUM('prestado', 'devuelto', 'atrasado') DEFAULT 'devuelto',
+            observaciones TEXT,
+            archivado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_archivo_fecha (fecha_prestamo, id),
+            FOREIGN KEY (libro_id) REFERENCES libros(id) ON DELETE CASCADE
+        )
+    ''')
+    # Selección de cada lote del archivado
+    asegurar_indice(cursor, 'prestamos', 'idx_prestamos_estado_real',
+                    'INDEX idx_prestamos_estado_real (estado, fecha_devolucion_real, id)')
+
+
+def _009_agregados_prestamos(cursor):
+    # Se rellenan con `flask reconstruir-agregados`
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS agregados_diarios (
+            dia DATE PRIMARY KEY,
+            prestamos INT NOT NULL DEFAULT 0,
+            devoluciones INT NOT NULL DEFAULT 0,
+            devoluciones_atrasadas INT NOT NULL DEFAULT 0,
+            dias_prestados BIGINT NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS agregados_generos (
+            mes DATE NOT NULL,
+            genero VARCHAR(100) NOT NULL,
+            prestamos INT NOT NULL DEFAULT 0,
+            devoluciones INT NOT NULL DEFAULT 0,
+            devoluciones_atrasadas INT NOT NULL DEFAULT 0,
+            dias_prestados BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (mes, genero)
+        ) DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    ''')
+
+
+def enlazar_prestatarios(cursor):
+    """Crea un prestatario por persona distinta del historial y enlaza sus préstamos.
+
+    Es parte de la migración 010 y la reutiliza `flask deduplicar-prestatarios`;
+    un cambio de criterio va en una migración nueva, no aquí.
+    """
+    # Un prestatario por persona del historial: mismo email (sin distinguir
+    # mayúsculas); sin email, mismo teléfono y nombre (o solo nombre). Solo toca préstamos sin
+    # prestatario_id, así que puede repetirse.
+    email = "LOWER(TRIM(p.email_prestatario))"
+    telefono = "NULLIF(TRIM(p.telefono), '')"
+    for tabla in ('prestamos', 'prestamos_archivo'):
+        cursor.execute(
+            f"""INSERT INTO prestatarios (nombre, email, telefono)
+            SELECT MAX(p.nombre_prestatario), {email}, MAX({telefono})
+            FROM {tabla} p
+            WHERE p.prestatario_id IS NULL AND {email} <> ''
+            GROUP BY {email}
+            ON DUPLICATE KEY UPDATE telefono = COALESCE(prestatarios.telefono, VALUES(telefono))"""
+        )
+        cursor.execute(
+            f"""INSERT INTO prestatarios (nombre, telefono)
+            SELECT DISTINCT p.nombre_prestatario, {telefono}
+            FROM {tabla} p
+            WHERE p.prestatario_id IS NULL AND COALESCE({email}, '') = ''
+              AND NOT EXISTS (
+                SELECT 1 FROM prestatarios pr
+                WHERE pr.email IS NULL AND pr.nombre = p.nombre_prestatario AND pr.telefono <=> {telefono}
+              )"""
+        )
+        cursor.execute(
+            f"""UPDATE {tabla} p JOIN prestatarios pr ON pr.email = {email}
+            SET p.prestatario_id = pr.id
+            WHERE p.prestatario_id IS NULL AND {email} <> ''"""
+        )
+        cursor.execute(
+            f"""UPDATE {tabla} p JOIN prestatarios pr
+              ON pr.email IS NULL AND pr.nombre = p.nombre_prestatario AND pr.telefono <=> {telefono}
+            SET p.prestatario_id = pr.id
+            WHERE p.prestatario_id IS NULL AND COALESCE({email}, '') = ''"""
+        )
+
+
+def _010_prestatarios(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS prestatarios (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            nombre VARCHAR(255) NOT NULL,
+            email VARCHAR(255),
+            telefono VARCHAR(20),
+            prestamos_activos INT NOT NULL DEFAULT 0,
+            creado TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE INDEX uq_prestatarios_email (email),
+            INDEX idx_prestatarios_telefono (telefono, nombre)
+        ) DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    ''')
+    for tabla in ('prestamos', 'prestamos_archivo'):
+        asegurar_columna(cursor, tabla, 'prestatario_id', 'INT NULL AFTER libro_id')
+    # Historial y préstamos abiertos de un prestatario
+    asegurar_indice(cursor, 'prestamos', 'idx_prestamos_prestatario_estado',
+                    'INDEX idx_prestamos_prestatario_estado (prestatario_id, estado)')
+    asegurar_indice(cursor, 'prestamos_archivo', 'idx_archivo_prestatario',
+                    'INDEX idx_archivo_prestatario (prestatario_id)')
+    enlazar_prestatarios(cursor)
+    cursor.execute(
+        """UPDATE prestatarios pr
+        LEFT JOIN (
+            SELECT prestatario_id, COUNT(*) AS activos FROM prestamos
+            WHERE estado <> 'devuelto' AND prestatario_id IS NOT NULL
+            GROUP BY prestatario_id
+        ) a ON a.prestatario_id = pr.id
+        SET pr.prestamos_activos = COALESCE(a.activos, 0)"""
+    )
+
+
+def _011_notificaciones(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS notificaciones (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            prestamo_id INT NOT NULL,
+            tipo ENUM('recordatorio', 'atraso') NOT NULL,
+            destinatario VARCHAR(255) NOT NULL,
+            nombre VARCHAR(255) NOT NULL,
+            titulo VARCHAR(255) NOT NULL,
+            fecha_devolucion DATE NOT NULL,
+            estado ENUM('pendiente', 'enviada', 'fallida', 'cancelada') NOT NULL DEFAULT 'pendiente',
+            intentos INT NOT NULL DEFAULT 0,
+            proximo_intento DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            ultimo_error TEXT,
+            creada TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            enviada DATETIME,
+            UNIQUE INDEX uq_notificaciones_prestamo_tipo (prestamo_id, tipo),
+            INDEX idx_notificaciones_cola (estado, proximo_intento)
+        ) DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    ''')
+
+
+def _012_lotes_disponibilidad(cursor):
+    # Contadores transaccionales: el bloqueo de la fila dura hasta el commit,
+    # así que los valores se asignan en orden de commit y sin huecos por rollback
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS secuencias (
+            clave VARCHAR(50) PRIMARY KEY,
+            valor BIGINT NOT NULL DEFAULT 0
+        )
+    ''')
+    asegurar_columna(cursor, 'eventos_disponibilidad', 'lote', 'BIGINT')
+    asegurar_indice(cursor, 'eventos_disponibilidad', 'idx_eventos_disponibilidad_lote',
+                    'INDEX idx_eventos_disponibilidad_lote (lote)')
+    # Los eventos ya existentes conservan su id como lote (los clientes conectados pueden reanudar)
+    cursor.execute("UPDATE eventos_disponibilidad SET lote = id WHERE lote IS NULL")
+    cursor.execute(
+        """INSERT INTO secuencias (clave, valor)
+        SELECT 'eventos_disponibilidad', COALESCE(MAX(lote), 0) FROM eventos_disponibilidad
+        ON DUPLICATE KEY UPDATE valor = GREATEST(valor, VALUES(valor))"""
+    )
+
+
+def _013_prestatarios_sin_email(cursor):
+    # Misma persona sin email: mismo teléfono (vacío si no hay) y nombre
+    unicos = """SELECT MIN(id) AS id, nombre, COALESCE(telefono, '') AS telefono
+        FROM prestatarios WHERE email IS NULL GROUP BY nombre, COALESCE(telefono, '')"""
+    # Antes del índice único se funden los duplicados de altas concurrentes
+    for tabla in ('prestamos', 'prestamos_archivo'):
+        cursor.execute(
+            f"""UPDATE {tabla} p
+            JOIN prestatarios pr ON pr.id = p.prestatario_id AND pr.email IS NULL
+            JOIN ({unicos}) u ON u.nombre = pr.nombre AND u.telefono = COALESCE(pr.telefono, '')
+            SET p.prestatario_id = u.id
+            WHERE pr.id <> u.id"""
+        )
+    cursor.execute(
+        f"""DELETE pr FROM prestatarios pr
+        JOIN ({unicos}) u ON u.nombre = pr.nombre AND u.telefono = COALESCE(pr.telefono, '')
+        WHERE pr.email IS NULL AND pr.id <> u.id"""
+    )
+    cursor.execute(
+        """UPDATE prestatarios pr
+        LEFT JOIN (
+            SELECT prestatario_id, COUNT(*) AS activos FROM prestamos
+            WHERE estado <> 'devuelto' AND prestatario_id IS NOT NULL
+            GROUP BY prestatario_id
+        ) a ON a.prestatario_id = pr.id
+        SET pr.prestamos_activos = COALESCE(a.activos, 0)"""
+    )
+    asegurar_columna(cursor, 'prestatarios', 'clave_sin_email',
+                     "VARCHAR(280) AS (IF(email IS NULL, CONCAT(COALESCE(telefono, ''), '|', nombre), NULL)) STORED")
+    asegurar_indice(cursor, 'prestatarios', 'uq_prestatarios_sin_email',
+                    'UNIQUE INDEX uq_prestatarios_sin_email (clave_sin_email)')
+
+
+def _014_colacion_catalogo(cursor):
+    # Las instalaciones anteriores a las migraciones crearon libros con la
+    # colación por defecto del servidor; la búsqueda cuenta con que ignore acentos
+    cursor.execute(
+        """SELECT (SELECT COUNT(*) FROM information_schema.tables
+                   WHERE table_schema = DATABASE() AND table_name = 'libros'
+                     AND table_collation <> 'utf8mb4_unicode_ci')
+             + (SELECT COUNT(*) FROM information_schema.columns
+                WHERE table_schema = DATABASE() AND table_name = 'libros'
+                  AND collation_name IS NOT NULL AND collation_name <> 'utf8mb4_unicode_ci')"""
+    )
+    if cursor.fetchone()[0]:
+        # Reconstruye la tabla y sus índices (también el FULLTEXT)
+        cursor.execute("ALTER TABLE libros CONVERT TO CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+
+
+MIGRACIONES = [
+    (1, 'Tablas base de libros y préstamos', _001_tablas_base),
+    (2, 'Índice FULLTEXT del catálogo', _002_busqueda_catalogo),
+    (3, 'Contadores del panel principal', _003_contadores_panel),
+    (4, 'Barrido de préstamos atrasados', _004_barrido_atrasos),
+    (5, 'Índices de las consultas de listados', _005_indices_consultas),
+    (6, 'Generación compartida de la caché del catálogo', _006_cache_compartida),
+    (7, 'Eventos de disponibilidad para Server-Sent Events', _007_eventos_disponibilidad),
+    (8, 'Archivo de préstamos devueltos', _008_archivo_prestamos),
+    (9, 'Agregados diarios para los informes', _009_agregados_prestamos),
+    (10, 'Prestatarios deduplicados con su historial indexado', _010_prestatarios),
+    (11, 'Cola de notificaciones por correo', _011_notificaciones),
+    (12, 'Lotes de eventos de disponibilidad en orden de commit', _012_lotes_disponibilidad),
+    (13, 'Prestatarios sin email únicos por teléfono y nombre', _013_prestatarios_sin_email),
+    (14, 'Colación sin acentos en el catálogo existente', _014_colacion_catalogo),
+]
+
+
+def version_actual(cursor):
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migraciones")
+    return cursor.fetchone()[0]
+
+
+def pendientes(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migraciones (
+            version INT PRIMARY KEY,
+            nombre VARCHAR(255) NOT NULL,
+            aplicada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute("SELECT version FROM schema_migraciones")
+    aplicadas = {fila[0] for fila in cursor.fetchall()}
+    return [migracion for migracion in MIGRACIONES if migracion[0] not in aplicadas]
+
+
+def migrar(conn, aviso=print):
+    """Aplica las migraciones pendientes en orden y devuelve sus versiones.
+
+    Un bloqueo con nombre evita que dos procesos migren a la vez; como el
+    DDL de MySQL hace commit implícito, cada migración debe poder repetirse
+    si el proceso se interrumpe antes de registrarla.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT GET_LOCK(%s, 60)", (BLOQUEO,))
+    if cursor.fetchone()[0] != 1:
+        cursor.close()
+        raise RuntimeError('Otro proceso está aplicando migraciones')
+
+    aplicadas = []
+    try:
+        for version, nombre, funcion in pendientes(cursor):
+            aviso(f"   → {version:03d} {nombre}")
+            funcion(cursor)
+            cursor.execute(
+                "INSERT INTO schema_migraciones (version, nombre) VALUES (%s, %s)",
+                (version, nombre)
+            )
+            conn.commit()
+            aplicadas.append(version)
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (BLOQUEO,))
+        cursor.fetchone()
+        cursor.close()
+    return aplicadas
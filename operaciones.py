@@ -0,0 +1,173 @@
+"""Préstamos y devoluciones como actualizaciones condicionales atómicas.
+
+Cada función trabaja sobre el cursor de una transacción abierta y comprueba
+las filas afectadas; si la operación no procede lanza OperacionRechazada y
+la ruta debe hacer rollback. El commit lo hace quien llama.
+"""
+from collections import Counter
+
+import agregados
+import prestatarios
+import resumen
+
+
+class OperacionRechazada(Exception):
+    """La operación no puede aplicarse en el estado actual de los datos"""
+
+    def __init__(self, mensaje, categoria='error'):
+        super().__init__(mensaje)
+        self.categoria = categoria
+
+
+def reservar_prestatario(cursor, nombre_prestatario, email_prestatario, telefono, cantidad, limite_activos):
+    """Resuelve (o da de alta) el prestatario y le suma `cantidad` préstamos dentro de su límite"""
+    prestatario_id = prestatarios.resolver(cursor, nombre_prestatario, email_prestatario, telefono)
+    if not prestatarios.reservar(cursor, prestatario_id, cantidad, limite_activos):
+        raise OperacionRechazada(
+            f'El prestatario alcanzaría el máximo de {limite_activos} préstamo(s) activos', 'warning'
+        )
+    return prestatario_id
+
+
+def prestar(cursor, libro_id, nombre_prestatario, email_prestatario, telefono,
+            fecha_prestamo, fecha_devolucion, observaciones=None, limite_activos=0):
+    """Descuenta un ejemplar solo si queda alguno y registra el préstamo. Devuelve su id"""
+    cursor.execute(
+        "UPDATE libros SET ejemplares_disponibles = ejemplares_disponibles - 1 "
+        "WHERE id = %s AND ejemplares_disponibles > 0",
+        (libro_id,)
+    )
+    if cursor.rowcount != 1:
+        raise OperacionRechazada('No hay ejemplares disponibles de este libro')
+    prestatario_id = reservar_prestatario(cursor, nombre_prestatario, email_prestatario, telefono,
+                                          1, limite_activos)
+
+    cursor.execute(
+        """INSERT INTO prestamos
+        (libro_id, prestatario_id, nombre_prestatario, email_prestatario, telefono,
+         fecha_prestamo, fecha_devolucion, observaciones)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
+        (libro_id, prestatario_id, nombre_prestatario, email_prestatario or None, telefono or None,
+         fecha_prestamo, fecha_devolucion, observaciones or None)
+    )
+    prestamo_id = cursor.lastrowid
+    resumen.prestamo_registrado(cursor, libro_id)
+    agregados.prestamos_registrados(cursor, [libro_id], fecha_prestamo)
+    return prestamo_id
+
+
+def devolver(cursor, prestamo_id, fecha_devolucion_real):
+    """Pasa el préstamo a 'devuelto' solo desde un estado abierto y repone el ejemplar"""
+    for estado in ('prestado', 'atrasado'):
+        cursor.execute(
+            "UPDATE prestamos SET estado = 'devuelto', fecha_devolucion_real = %s "
+            "WHERE id = %s AND estado = %s",
+            (fecha_devolucion_real, prestamo_id, estado)
+        )
+        if cursor.rowcount == 1:
+            break
+    else:
+        cursor.execute("SELECT estado FROM prestamos WHERE id = %s", (prestamo_id,))
+        if cursor.fetchone() is None:
+            raise OperacionRechazada('Préstamo no encontrado')
+        raise OperacionRechazada('Este préstamo ya fue devuelto', 'warning')
+
+    cursor.execute(
+        "UPDATE libros SET ejemplares_disponibles = ejemplares_disponibles + 1 "
+        "WHERE id = (SELECT libro_id FROM prestamos WHERE id = %s)",
+        (prestamo_id,)
+    )
+    prestatarios.liberar_prestamo(cursor, prestamo_id)
+    resumen.prestamo_devuelto(cursor, estado)
+    agregados.prestamos_devueltos(cursor, [prestamo_id])
+
+
+def bloquear_libros(cursor, libro_ids=(), prestamo_ids=()):
+    """Bloquea de una vez, en orden de id, los libros que va a tocar un lote.
+
+    Incluye los de `prestamo_ids` (devoluciones). Llamar antes de devolver_lote
+    y prestar_lote: por separado cada una bloquea su parte en orden, pero dos
+    lotes cruzados (uno devuelve lo que el otro presta) se interbloquearían.
+    """
+    ids = set(libro_ids)
+    prestamo_ids = list(dict.fromkeys(prestamo_ids))
+    if prestamo_ids:
+        marcadores = ', '.join(['%s'] * len(prestamo_ids))
+        cursor.execute(f"SELECT DISTINCT libro_id FROM prestamos WHERE id IN ({marcadores})", prestamo_ids)
+        ids.update(fila[0] for fila in cursor.fetchall())
+    if not ids:
+        return
+    ids = sorted(ids)
+    marcadores = ', '.join(['%s'] * len(ids))
+    cursor.execute(f"SELECT id FROM libros WHERE id IN ({marcadores}) ORDER BY id FOR UPDATE", ids)
+    cursor.fetchall()
+
+
+def prestar_lote(cursor, libro_ids, nombre_prestatario, email_prestatario, telefono,
+                 fecha_prestamo, fecha_devolucion, observaciones=None, limite_activos=0):
+    """Presta varios libros a un mismo prestatario con una sentencia por libro distinto"""
+    # Siempre en orden de id: dos lotes con libros en común bloquean las filas en
+    # el mismo orden y uno espera al otro en vez de acabar en un interbloqueo
+    copias = sorted(Counter(libro_ids).items())
+    for libro_id, cantidad in copias:
+        cursor.execute(
+            "UPDATE libros SET ejemplares_disponibles = ejemplares_disponibles - %s "
+            "WHERE id = %s AND ejemplares_disponibles >= %s",
+            (cantidad, libro_id, cantidad)
+        )
+        if cursor.rowcount != 1:
+            raise OperacionRechazada(f'No hay ejemplares disponibles del libro {libro_id}')
+    prestatario_id = reservar_prestatario(cursor, nombre_prestatario, email_prestatario, telefono,
+                                          len(libro_ids), limite_activos)
+
+    fila = (prestatario_id, nombre_prestatario, email_prestatario or None, telefono or None,
+            fecha_prestamo, fecha_devolucion, observaciones or None)
+    cursor.execute(
+        """INSERT INTO prestamos
+        (libro_id, prestatario_id, nombre_prestatario, email_prestatario, telefono,
+         fecha_prestamo, fecha_devolucion, observaciones)
+        VALUES """ + ', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s)'] * len(libro_ids)),
+        [valor for libro_id in libro_ids for valor in (libro_id,) + fila]
+    )
+
+    resumen.sumar(cursor, prestamos_activos=len(libro_ids))
+    for libro_id, cantidad in copias:
+        resumen.sumar_prestamos_libro(cursor, libro_id, cantidad)
+    agregados.prestamos_registrados(cursor, libro_ids, fecha_prestamo)
+
+
+def devolver_lote(cursor, prestamo_ids, fecha_devolucion_real):
+    """Devuelve varios préstamos; falla entero si alguno no existe o ya estaba devuelto"""
+    prestamo_ids = list(dict.fromkeys(prestamo_ids))
+    marcadores = ', '.join(['%s'] * len(prestamo_ids))
+    cursor.execute(
+        f"SELECT id, libro_id, estado, prestatario_id FROM prestamos WHERE id IN ({marcadores}) FOR UPDATE",
+        prestamo_ids
+    )
+    filas = {fila[0]: fila for fila in cursor.fetchall()}
+    for prestamo_id in prestamo_ids:
+        if prestamo_id not in filas:
+            raise OperacionRechazada(f'Préstamo {prestamo_id} no encontrado')
+        if filas[prestamo_id][2] == 'devuelto':
+            raise OperacionRechazada(f'El préstamo {prestamo_id} ya fue devuelto')
+
+    cursor.execute(
+        f"UPDATE prestamos SET estado = 'devuelto', fecha_devolucion_real = %s "
+        f"WHERE id IN ({marcadores}) AND estado <> 'devuelto'",
+        [fecha_devolucion_real] + prestamo_ids
+    )
+    if cursor.rowcount != len(prestamo_ids):
+        raise OperacionRechazada('Algún préstamo cambió de estado durante la devolución')
+
+    for libro_id, cantidad in sorted(Counter(fila[1] for fila in filas.values()).items()):
+        cursor.execute(
+            "UPDATE libros SET ejemplares_disponibles = ejemplares_disponibles + %s WHERE id = %s",
+            (cantidad, libro_id)
+        )
+    estados = Counter(fila[2] for fila in filas.values())
+    resumen.sumar(cursor, **{
+        resumen.CONTADOR_POR_ESTADO[estado]: -cantidad
+        for estado, cantidad in estados.items() if estado in resumen.CONTADOR_POR_ESTADO
+    })
+    prestatarios.liberar(cursor, [fila[3] for fila in filas.values()])
+    agregados.prestamos_devueltos(cursor, prestamo_ids)
@@ -0,0 +1,105 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+TAMANO_PAGINA = 50
+TAMANO_MAXIMO = 200
+
+
+def leer_tamano(valor, defecto=TAMANO_PAGINA, maximo=TAMANO_MAXIMO):
+    """Interpreta el parámetro `limite` acotándolo a [1, maximo]"""
+    try:
+        tamano = int(valor)
+    except (TypeError, ValueError):
+        return defecto
+    return max(1, min(tamano, maximo))
+
+
+def _serializar(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+def codificar_cursor(valores):
+    """Convierte los valores de ordenación de una fila en un token opaco para la URL"""
+    datos = json.dumps([_serializar(v) for v in valores], separators=(',', ':'))
+    return base64.urlsafe_b64encode(datos.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(token):
+    """Devuelve la lista de valores de un cursor, o None si no es válido"""
+    if not token:
+        return None
+    try:
+        relleno = '=' * (-len(token) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(token + relleno).decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return valores if isinstance(valores, list) else None
+
+
+def condicion_keyset(expresiones, valores, operador):
+    """Construye `(a op x OR (a = x AND b op y) ...)` para continuar tras `valores`"""
+    partes = []
+    params = []
+    for i, expresion in enumerate(expresiones):
+        iguales = [f"{e} = %s" for e in expresiones[:i]]
+        partes.append('(' + ' AND '.join(iguales + [f"{expresion} {operador} %s"]) + ')')
+        params.extend(valores[:i] + [valores[i]])
+    return '(' + ' OR '.join(partes) + ')', params
+
+
+def _valor(fila, clave):
+    """Columna de una fila de cursor dictionary=True o named_tuple=True"""
+    return fila[clave] if isinstance(fila, dict) else getattr(fila, clave)
+
+
+def paginar(cursor, query, params, orden, despues=None, antes=None,
+            tamano=TAMANO_PAGINA, descendente=False):
+    """Ejecuta `query` (terminada en su cláusula WHERE) con paginación por keyset.
+
+    `orden` es una lista de pares (expresión SQL, clave en la fila); la última
+    debe ser única (el id) para que el orden sea estable. Devuelve
+    (filas, cursor_siguiente, cursor_anterior).
+    """
+    expresiones = [expresion for expresion, _ in orden]
+    claves = [clave for _, clave in orden]
+    valores = decodificar_cursor(antes if antes is not None else despues)
+    if valores is not None and len(valores) != len(orden):
+        valores = None
+    hacia_atras = antes is not None and valores is not None
+
+    params = list(params)
+    invertir = descendente != hacia_atras
+    if valores is not None:
+        condicion, extra = condicion_keyset(expresiones, valores, '<' if invertir else '>')
+        query += " AND " + condicion
+        params.extend(extra)
+
+    sentido = ' DESC' if invertir else ''
+    query += " ORDER BY " + ', '.join(e + sentido for e in expresiones) + " LIMIT %s"
+    params.append(tamano + 1)
+    cursor.execute(query, params)
+    filas = cursor.fetchall()
+
+    hay_mas = len(filas) > tamano
+    filas = filas[:tamano]
+    if hacia_atras:
+        filas.reverse()
+
+    def token(fila):
+        return codificar_cursor([_valor(fila, clave) for clave in claves])
+
+    siguiente = anterior = None
+    if filas:
+        if hacia_atras:
+            siguiente = token(filas[-1])
+            anterior = token(filas[0]) if hay_mas else None
+        else:
+            siguiente = token(filas[-1]) if hay_mas else None
+            anterior = token(filas[0]) if valores is not None else None
+    return filas, siguiente, anterior
@@ -0,0 +1,202 @@
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+
+
+class PoolAgotado(mysql.connector.Error):
+    """No se liberó ninguna conexión dentro del tiempo de espera máximo"""
+
+
+class ConexionPool:
+    """Conexión prestada por el pool; close() la devuelve en lugar de cerrarla"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        # True si se hizo commit de alguna escritura con esta conexión
+        self.confirmada = False
+
+    @property
+    def cerrada(self):
+        return self._conn is None
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.devolver(conn)
+
+    def cursor(self, *args, **kwargs):
+        if self._conn is None:
+            raise mysql.connector.InterfaceError('La conexión ya fue devuelta al pool')
+        cursor = self._conn.cursor(*args, **kwargs)
+        if self._pool.envolver_cursor is not None:
+            cursor = self._pool.envolver_cursor(cursor)
+        return cursor
+
+    def commit(self):
+        if self._conn is None:
+            raise mysql.connector.InterfaceError('La conexión ya fue devuelta al pool')
+        self._conn.commit()
+        self.confirmada = True
+
+    def descartar(self):
+        """Cierra la conexión en lugar de devolverla (p. ej. con un resultado a medio leer)"""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.descartar(conn)
+
+    def __getattr__(self, nombre):
+        if self._conn is None:
+            raise mysql.connector.InterfaceError('La conexión ya fue devuelta al pool')
+        return getattr(self._conn, nombre)
+
+
+class PoolConexiones:
+    """Pool de conexiones MySQL de tamaño fijo con verificación de salud al prestar"""
+
+    def __init__(self, tamano=5, espera_maxima=10.0, verificar_tras=5.0,
+                 timeout_lectura=None, envolver_cursor=None, **parametros):
+        self.tamano = tamano
+        self.espera_maxima = espera_maxima
+        self.verificar_tras = verificar_tras
+        self.timeout_lectura = timeout_lectura
+        # Función aplicada a cada cursor que piden las conexiones prestadas (p. ej. métricas)
+        self.envolver_cursor = envolver_cursor
+        self._parametros = parametros
+        self._parametros.setdefault('consume_results', True)
+        self._libres = deque()
+        self._creadas = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            'en_uso': 0,
+            'prestamos': 0,
+            'esperas': 0,
+            'tiempo_espera_total': 0.0,
+            'tiempo_espera_max': 0.0,
+            'agotado': 0,
+            'creadas': 0,
+            'descartadas': 0,
+        }
+
+    def _crear(self):
+        conn = mysql.connector.connect(**self._parametros)
+        if self.timeout_lectura:
+            # max_execution_time limita cada SELECT de la sesión (milisegundos)
+            cursor = conn.cursor()
+            cursor.execute("SET SESSION max_execution_time = %s", (int(self.timeout_lectura * 1000),))
+            cursor.close()
+        self._contar('creadas')
+        return conn
+
+    def _contar(self, clave):
+        with self._cond:
+            self._stats[clave] += 1
+
+    @staticmethod
+    def _esta_viva(conn):
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except mysql.connector.Error:
+            return False
+
+    @staticmethod
+    def _cerrar(conn):
+        try:
+            conn.close()
+        except mysql.connector.Error:
+            pass
+
+    def obtener(self):
+        """Presta una conexión, esperando como máximo `espera_maxima` segundos"""
+        inicio = time.monotonic()
+        limite = inicio + self.espera_maxima
+        espero = False
+        conn = None
+        ultimo_uso = None
+
+        with self._cond:
+            while True:
+                if self._libres:
+                    conn, ultimo_uso = self._libres.pop()
+                    break
+                if self._creadas < self.tamano:
+                    self._creadas += 1
+                    break
+                espero = True
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self._stats['agotado'] += 1
+                    raise PoolAgotado(msg=f'Pool agotado tras {self.espera_maxima}s de espera')
+                self._cond.wait(restante)
+
+            self._stats['en_uso'] += 1
+            self._stats['prestamos'] += 1
+            if espero:
+                espera = time.monotonic() - inicio
+                self._stats['esperas'] += 1
+                self._stats['tiempo_espera_total'] += espera
+                self._stats['tiempo_espera_max'] = max(self._stats['tiempo_espera_max'], espera)
+
+        try:
+            if conn is not None and time.monotonic() - ultimo_uso >= self.verificar_tras:
+                if not self._esta_viva(conn):
+                    self._contar('descartadas')
+                    self._cerrar(conn)
+                    conn = None
+            if conn is None:
+                conn = self._crear()
+        except mysql.connector.Error:
+            with self._cond:
+                self._creadas -= 1
+                self._stats['en_uso'] -= 1
+                self._stats['prestamos'] -= 1
+                self._cond.notify()
+            raise
+
+        return ConexionPool(self, conn)
+
+    def devolver(self, conn):
+        """Devuelve la conexión al pool descartando cualquier transacción abierta"""
+        try:
+            conn.rollback()
+            reutilizable = True
+        except mysql.connector.Error:
+            self._contar('descartadas')
+            self._cerrar(conn)
+            reutilizable = False
+
+        with self._cond:
+            self._stats['en_uso'] -= 1
+            if reutilizable:
+                self._libres.append((conn, time.monotonic()))
+            else:
+                self._creadas -= 1
+            self._cond.notify()
+
+    def descartar(self, conn):
+        """Cierra una conexión prestada liberando su hueco en el pool"""
+        self._cerrar(conn)
+        with self._cond:
+            self._stats['en_uso'] -= 1
+            self._stats['descartadas'] += 1
+            self._creadas -= 1
+            self._cond.notify()
+
+    def cerrar(self):
+        """Cierra las conexiones libres (las prestadas se cierran al devolverse)"""
+        with self._cond:
+            while self._libres:
+                conn, _ = self._libres.pop()
+                self._creadas -= 1
+                self._cerrar(conn)
+
+    def estadisticas(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['libres'] = len(self._libres)
+            stats['abiertas'] = self._creadas
+            stats['tamano'] = self.tamano
+        return stats
@@ -0,0 +1,106 @@
+"""Prestatarios: identidad única por email (o por teléfono y nombre si no hay email).
+
+Cada préstamo apunta a su prestatario con prestamos.prestatario_id; las
+columnas nombre/email/teléfono del préstamo se conservan como copia de lo
+que se registró. prestatarios.prestamos_activos es un contador mantenido en
+la misma transacción que prestar y devolver, y es el que aplica el límite de
+préstamos abiertos con una actualización condicional.
+"""
+from collections import Counter
+
+# Columnas públicas (clave_sin_email es una columna generada interna)
+COLUMNAS = 'id, nombre, email, telefono, prestamos_activos, creado'
+
+
+def normalizar_email(email):
+    return (email or '').strip().lower() or None
+
+
+def resolver(cursor, nombre, email, telefono):
+    """Id del prestatario con ese email (o teléfono y nombre), creándolo si no existe"""
+    email = normalizar_email(email)
+    telefono = (telefono or '').strip() or None
+    if email:
+        # El índice único sobre email hace que el alta concurrente no duplique
+        cursor.execute(
+            """INSERT INTO prestatarios (nombre, email, telefono) VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id), nombre = VALUES(nombre),
+                telefono = COALESCE(VALUES(telefono), telefono)""",
+            (nombre, email, telefono)
+        )
+        return cursor.lastrowid
+
+    # Sin email, el índice único sobre clave_sin_email (teléfono y nombre) cumple
+    # el mismo papel: dos altas simultáneas de la misma persona dan un solo prestatario
+    cursor.execute(
+        """INSERT INTO prestatarios (nombre, telefono) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)""",
+        (nombre, telefono)
+    )
+    return cursor.lastrowid
+
+
+def reservar(cursor, prestatario_id, cantidad, limite):
+    """Suma `cantidad` préstamos activos solo si no se supera `limite` (0 = sin límite).
+
+    Devuelve False si el prestatario ya está en el límite.
+    """
+    cursor.execute(
+        "UPDATE prestatarios SET prestamos_activos = prestamos_activos + %s "
+        "WHERE id = %s AND (%s = 0 OR prestamos_activos + %s <= %s)",
+        (cantidad, prestatario_id, limite, cantidad, limite)
+    )
+    return cursor.rowcount == 1
+
+
+def liberar(cursor, prestatario_ids):
+    """Descuenta un préstamo activo por cada aparición de cada id (None se ignora)"""
+    # En orden de id, como el resto de actualizaciones por lotes
+    for prestatario_id, cantidad in sorted(Counter(i for i in prestatario_ids if i is not None).items()):
+        cursor.execute(
+            "UPDATE prestatarios SET prestamos_activos = GREATEST(prestamos_activos - %s, 0) WHERE id = %s",
+            (cantidad, prestatario_id)
+        )
+
+
+def liberar_prestamo(cursor, prestamo_id):
+    cursor.execute(
+        "UPDATE prestatarios SET prestamos_activos = GREATEST(prestamos_activos - 1, 0) "
+        "WHERE id = (SELECT prestatario_id FROM prestamos WHERE id = %s)",
+        (prestamo_id,)
+    )
+
+
+def libro_eliminado(cursor, libro_id):
+    """Libera los préstamos abiertos del libro (se borran en cascada). Llamar antes del DELETE"""
+    cursor.execute(
+        "SELECT prestatario_id FROM prestamos WHERE libro_id = %s AND estado <> 'devuelto'",
+        (libro_id,)
+    )
+    liberar(cursor, [fila['prestatario_id'] if isinstance(fila, dict) else fila[0]
+                     for fila in cursor.fetchall()])
+
+
+def buscar(cursor, email=None, telefono=None):
+    """Prestatarios por email exacto o por teléfono (índices de la tabla)"""
+    if email:
+        cursor.execute(f"SELECT {COLUMNAS} FROM prestatarios WHERE email = %s", (normalizar_email(email),))
+    else:
+        cursor.execute(f"SELECT {COLUMNAS} FROM prestatarios WHERE telefono = %s ORDER BY id LIMIT 50",
+                       (telefono.strip(),))
+    return cursor.fetchall()
+
+
+# ==================== DEDUPLICACIÓN ====================
+
+def recontar(cursor):
+    """Recalcula prestamos_activos desde los préstamos abiertos"""
+    cursor.execute(
+        """UPDATE prestatarios pr
+        LEFT JOIN (
+            SELECT prestatario_id, COUNT(*) AS activos FROM prestamos
+            WHERE estado <> 'devuelto' AND prestatario_id IS NOT NULL
+            GROUP BY prestatario_id
+        ) a ON a.prestatario_id = pr.id
+        SET pr.prestamos_activos = COALESCE(a.activos, 0)"""
+    )
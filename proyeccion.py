@@ -0,0 +1,91 @@
+"""Selección de campos (?fields=) y lotes de ids para la API v2.
+
+Cada recurso declara sus campos públicos como {nombre: expresión SQL}; la
+consulta selecciona solo los pedidos más las claves de ordenación que
+necesita `paginar`, y estas se quitan de la respuesta si no se pidieron.
+"""
+
+CAMPOS_LIBRO = {
+    campo: campo for campo in (
+        'id', 'titulo', 'autor', 'isbn', 'genero', 'anio_publicacion', 'editorial',
+        'ejemplares', 'ejemplares_disponibles', 'fecha_registro',
+    )
+}
+
+# Los campos de libro solo se piden con JOIN si hace falta alguno
+CAMPOS_PRESTAMO = {
+    'id': 'p.id',
+    'libro_id': 'p.libro_id',
+    'prestatario_id': 'p.prestatario_id',
+    'nombre_prestatario': 'p.nombre_prestatario',
+    'email_prestatario': 'p.email_prestatario',
+    'telefono': 'p.telefono',
+    'fecha_prestamo': 'p.fecha_prestamo',
+    'fecha_devolucion': 'p.fecha_devolucion',
+    'fecha_devolucion_real': 'p.fecha_devolucion_real',
+    'estado': 'p.estado',
+    'observaciones': 'p.observaciones',
+    'titulo': 'l.titulo',
+    'autor': 'l.autor',
+    'isbn': 'l.isbn',
+}
+
+MAXIMO_IDS = 200
+
+
+def leer_campos(valor, disponibles):
+    """Campos de `fields=a,b,c` en orden y sin repetir (todos si no viene).
+
+    Devuelve (campos, None) o (None, mensaje de error).
+    """
+    if not valor:
+        return list(disponibles), None
+    campos = list(dict.fromkeys(c.strip() for c in valor.split(',') if c.strip()))
+    desconocidos = [c for c in campos if c not in disponibles]
+    if desconocidos:
+        return None, f"Campos desconocidos: {', '.join(desconocidos)}"
+    if not campos:
+        return None, 'Indica al menos un campo'
+    return campos, None
+
+
+def leer_ids(valor, maximo=MAXIMO_IDS):
+    """Ids de `ids=1,2,3` sin repetir. Devuelve (ids, None) o (None, mensaje de error)"""
+    try:
+        ids = list(dict.fromkeys(int(i) for i in valor.split(',') if i.strip()))
+    except ValueError:
+        return None, 'Los identificadores deben ser números enteros'
+    if not ids:
+        return None, 'Indica al menos un identificador'
+    if len(ids) > maximo:
+        return None, f'Como máximo {maximo} identificadores por petición'
+    return ids, None
+
+
+def columnas(campos, disponibles, claves=()):
+    """Lista `expresión AS campo` de los campos pedidos más las `claves` que falten.
+
+    Una clave que no es un campo público (la relevancia de la búsqueda) se
+    selecciona tal cual.
+    """
+    seleccion = list(campos) + [clave for clave in claves if clave not in campos]
+    expresiones = [(disponibles.get(campo, campo), campo) for campo in seleccion]
+    return ', '.join(
+        expresion if expresion == campo else f'{expresion} AS {campo}' for expresion, campo in expresiones
+    )
+
+
+def usa_tabla(campos, disponibles, alias):
+    """Si algún campo pedido sale de la tabla con ese alias"""
+    return any(disponibles[campo].startswith(alias + '.') for campo in campos)
+
+
+def recortar(filas, campos):
+    """Deja en cada fila (dict) solo los campos pedidos, en su orden"""
+    return [{campo: fila[campo] for campo in campos} for fila in filas]
+
+
+def ordenar_por_ids(filas, ids):
+    """Filas en el orden de `ids` y la lista de ids que no aparecieron"""
+    por_id = {fila['id']: fila for fila in filas}
+    return [por_id[i] for i in ids if i in por_id], [i for i in ids if i not in por_id]
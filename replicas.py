@@ -0,0 +1,120 @@
+"""Lecturas repartidas entre réplicas MySQL.
+
+Las réplicas se usan por turnos; antes de prestar una conexión se comprueba
+(como mucho una vez por `intervalo_lag` segundos) cuánto va retrasada y,
+si supera `lag_maximo` o no responde, se prueba la siguiente. Si ninguna
+sirve, quien llama usa el primario.
+
+Cada réplica tiene su propio cortacircuitos: la que no acepta conexiones se
+salta durante `espera_caida` segundos en lugar de hacer pagar a cada lectura
+el timeout de conexión; pasado ese tiempo una sola petición la vuelve a probar.
+"""
+import itertools
+import threading
+import time
+
+import mysql.connector
+
+import circuito
+
+
+def leer_replicas(texto, puerto_por_defecto=3306):
+    """'host1:3307,host2' -> [('host1', 3307), ('host2', 3306)]"""
+    replicas = []
+    for parte in (texto or '').split(','):
+        parte = parte.strip()
+        if not parte:
+            continue
+        host, _, puerto = parte.partition(':')
+        replicas.append((host, int(puerto) if puerto else puerto_por_defecto))
+    return replicas
+
+
+def retraso_replica(conn):
+    """Segundos de retraso de la réplica; None si la replicación está parada.
+
+    Un servidor sin replicación configurada se considera al día.
+    """
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("SHOW REPLICA STATUS")
+        clave = 'Seconds_Behind_Source'
+    except mysql.connector.ProgrammingError:
+        # MySQL anterior a 8.0.22
+        cursor.execute("SHOW SLAVE STATUS")
+        clave = 'Seconds_Behind_Master'
+    estado = cursor.fetchone()
+    cursor.close()
+    if estado is None:
+        return 0
+    return estado.get(clave)
+
+
+class Replicas:
+    """Conjunto de pools de réplicas con reparto por turnos y control de retraso"""
+
+    def __init__(self, pools, lag_maximo=5.0, intervalo_lag=2.0, espera_caida=10.0):
+        # Lista de (nombre, PoolConexiones)
+        self.pools = pools
+        self.lag_maximo = lag_maximo
+        self.intervalo_lag = intervalo_lag
+        self._turno = itertools.count()
+        self._retrasos = {}
+        # Un fallo de conexión basta para saltarse la réplica durante espera_caida
+        self._cortes = {nombre: circuito.Circuito(1, espera_caida) for nombre, _ in pools}
+        self._lock = threading.Lock()
+        self._stats = {'lecturas': 0, 'retrasadas': 0, 'caidas': 0, 'saltadas': 0, 'respaldo_primario': 0}
+
+    def _contar(self, clave):
+        with self._lock:
+            self._stats[clave] += 1
+
+    def _retraso(self, nombre, conn):
+        ahora = time.monotonic()
+        comprobado, retraso = self._retrasos.get(nombre, (None, None))
+        if comprobado is None or ahora - comprobado >= self.intervalo_lag:
+            try:
+                retraso = retraso_replica(conn)
+            except mysql.connector.Error:
+                retraso = None
+            self._retrasos[nombre] = (ahora, retraso)
+        return retraso
+
+    def obtener(self):
+        """Conexión a una réplica al día, o None si hay que leer del primario"""
+        inicio = next(self._turno)
+        for desplazamiento in range(len(self.pools)):
+            nombre, pool = self.pools[(inicio + desplazamiento) % len(self.pools)]
+            corte = self._cortes[nombre]
+            if not corte.permitir():
+                self._contar('saltadas')
+                continue
+            try:
+                conn = pool.obtener()
+            except mysql.connector.Error as err:
+                if circuito.es_fallo_de_servidor(err):
+                    corte.fallo()
+                self._contar('caidas')
+                continue
+            else:
+                corte.exito()
+            finally:
+                corte.soltar_sondeo()
+            retraso = self._retraso(nombre, conn)
+            if retraso is not None and retraso <= self.lag_maximo:
+                self._contar('lecturas')
+                return conn
+            self._contar('retrasadas')
+            conn.close()
+        self._contar('respaldo_primario')
+        return None
+
+    def estadisticas(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['replicas'] = [
+            dict(pool.estadisticas(), nombre=nombre, retraso=self._retrasos.get(nombre, (None, None))[1],
+                 circuito=self._cortes[nombre].estado)
+            for nombre, pool in self.pools
+        ]
+        return stats
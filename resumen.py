@@ -0,0 +1,120 @@
+"""Contadores del panel principal mantenidos en la misma transacción que cada escritura.
+
+Todas las funciones reciben un cursor de una conexión con la transacción
+abierta; el commit lo hace la ruta que las llama.
+"""
+from archivo import TABLAS_HISTORIAL
+
+CONTADORES = ('total_libros', 'prestamos_activos', 'prestamos_atrasados')
+
+# Estado del préstamo -> contador que lo refleja
+CONTADOR_POR_ESTADO = {
+    'prestado': 'prestamos_activos',
+    'atrasado': 'prestamos_atrasados',
+}
+
+
+def sumar(cursor, **deltas):
+    """Aplica incrementos (o decrementos) atómicos a los contadores globales"""
+    filas = [(clave, delta) for clave, delta in deltas.items() if delta]
+    if not filas:
+        return
+    cursor.execute(
+        "INSERT INTO resumen_contadores (clave, valor) VALUES "
+        + ', '.join(['(%s, %s)'] * len(filas))
+        + " ON DUPLICATE KEY UPDATE valor = valor + VALUES(valor)",
+        [valor for fila in filas for valor in fila]
+    )
+
+
+def sumar_prestamos_libro(cursor, libro_id, delta):
+    cursor.execute(
+        """INSERT INTO resumen_libros (libro_id, total_prestamos) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE total_prestamos = total_prestamos + VALUES(total_prestamos)""",
+        (libro_id, delta)
+    )
+
+
+def libro_agregado(cursor, libro_id):
+    cursor.execute("INSERT IGNORE INTO resumen_libros (libro_id, total_prestamos) VALUES (%s, 0)", (libro_id,))
+    sumar(cursor, total_libros=1)
+
+
+def libro_eliminado(cursor, libro_id):
+    """Descuenta el libro y sus préstamos abiertos (se borran en cascada). Llamar antes del DELETE"""
+    cursor.execute("SELECT id FROM libros WHERE id = %s FOR UPDATE", (libro_id,))
+    if cursor.fetchone() is None:
+        return
+    cursor.execute(
+        "SELECT estado, COUNT(*) FROM prestamos WHERE libro_id = %s AND estado <> 'devuelto' GROUP BY estado",
+        (libro_id,)
+    )
+    deltas = {'total_libros': -1}
+    for estado, cantidad in cursor.fetchall():
+        if estado in CONTADOR_POR_ESTADO:
+            deltas[CONTADOR_POR_ESTADO[estado]] = -cantidad
+    sumar(cursor, **deltas)
+
+
+def prestamo_registrado(cursor, libro_id):
+    sumar(cursor, prestamos_activos=1)
+    sumar_prestamos_libro(cursor, libro_id, 1)
+
+
+def prestamo_devuelto(cursor, estado_anterior):
+    if estado_anterior in CONTADOR_POR_ESTADO:
+        sumar(cursor, **{CONTADOR_POR_ESTADO[estado_anterior]: -1})
+
+
+def prestamo_eliminado(cursor, libro_id):
+    sumar_prestamos_libro(cursor, libro_id, -1)
+
+
+def sincronizar_libros(cursor):
+    """Tras una carga masiva: recuenta los libros y da de alta los que falten en el ranking"""
+    cursor.execute(
+        """INSERT INTO resumen_contadores (clave, valor)
+        SELECT 'total_libros', COUNT(*) FROM libros
+        ON DUPLICATE KEY UPDATE valor = VALUES(valor)"""
+    )
+    cursor.execute(
+        """INSERT INTO resumen_libros (libro_id, total_prestamos)
+        SELECT l.id, 0 FROM libros l
+        LEFT JOIN resumen_libros r ON r.libro_id = l.id
+        WHERE r.libro_id IS NULL"""
+    )
+
+
+def leer(cursor):
+    """Devuelve los contadores globales como diccionario (0 si no existen)"""
+    cursor.execute(
+        "SELECT clave, valor FROM resumen_contadores WHERE clave IN (%s, %s, %s)",
+        CONTADORES
+    )
+    contadores = dict.fromkeys(CONTADORES, 0)
+    for fila in cursor.fetchall():
+        clave, valor = (fila['clave'], fila['valor']) if isinstance(fila, dict) else fila
+        contadores[clave] = int(valor)
+    return contadores
+
+
+def reconstruir(cursor):
+    """Recalcula todos los contadores desde las tablas libros, prestamos y el archivo"""
+    cursor.execute("DELETE FROM resumen_contadores")
+    cursor.execute(
+        """INSERT INTO resumen_contadores (clave, valor)
+        SELECT 'total_libros', COUNT(*) FROM libros
+        UNION ALL
+        SELECT 'prestamos_activos', COUNT(*) FROM prestamos WHERE estado = 'prestado'
+        UNION ALL
+        SELECT 'prestamos_atrasados', COUNT(*) FROM prestamos WHERE estado = 'atrasado'"""
+    )
+    historial = ' UNION ALL '.join(f"SELECT libro_id FROM {tabla}" for tabla in TABLAS_HISTORIAL)
+    cursor.execute("DELETE FROM resumen_libros")
+    cursor.execute(
+        f"""INSERT INTO resumen_libros (libro_id, total_prestamos)
+        SELECT l.id, COUNT(p.libro_id)
+        FROM libros l
+        LEFT JOIN ({historial}) p ON l.id = p.libro_id
+        GROUP BY l.id"""
+    )
@@ -0,0 +1,268 @@
+"""Índice en memoria para autocompletar libros por prefijo.
+
+Las claves son las palabras normalizadas del título y del autor y el ISBN sin
+guiones. Se guarda una lista ordenada de claves distintas y, por clave, los
+ids de sus libros (un entero si es uno solo, un array ordenado si son más),
+así que cada libro ocupa una entrada por palabra y una búsqueda es un bisect
+más un recorrido corto. Una búsqueda de varias palabras se resuelve por la
+primera y se comprueba contra el título y el autor.
+
+Se construye en segundo plano y se mantiene con los eventos de
+disponibilidad, que llegan con cada escritura del catálogo.
+"""
+import bisect
+import logging
+import threading
+import unicodedata
+from array import array
+
+import mysql.connector
+
+from busqueda import LONGITUD_MINIMA
+
+logger = logging.getLogger('biblioteca.sugerencias')
+
+LONGITUD_CLAVE = 40
+LIMITE_MAXIMO = 50
+# Cota de libros recorridos por consulta (prefijos cortos con muchos libros prestados)
+RECORRIDO_MAXIMO = 2000
+
+
+def normalizar(texto):
+    """Minúsculas, sin acentos y con los espacios colapsados"""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+
+def palabras(texto):
+    """Palabras indexadas de un texto normalizado: la primera siempre, el resto si no son muy cortas"""
+    partes = texto.split(' ')
+    return {palabra[:LONGITUD_CLAVE] for i, palabra in enumerate(partes)
+            if palabra and (i == 0 or len(palabra) >= LONGITUD_MINIMA)}
+
+
+def claves(titulo, autor, isbn):
+    resultado = palabras(normalizar(titulo)) | palabras(normalizar(autor))
+    if isbn:
+        resultado.add(isbn.replace('-', '').replace(' ', '').lower())
+    resultado.discard('')
+    return resultado
+
+
+def _ids(valor):
+    return (valor,) if isinstance(valor, int) else valor
+
+
+class IndiceSugerencias:
+    """Índice de prefijos de los libros del catálogo"""
+
+    def __init__(self, obtener_conexion):
+        self.obtener_conexion = obtener_conexion
+        self.listo = False
+        self._construyendo = False
+        # Claves distintas en orden y, por clave, un id o un array('l') de ids ordenados
+        self._claves = []
+        self._ids_por_clave = {}
+        # libro_id -> (titulo, autor, isbn, ejemplares_disponibles)
+        self._libros = {}
+        # Cambios llegados mientras se construía el índice
+        self._pendientes = set()
+        self._recargar_todo = False
+        self._lock = threading.RLock()
+
+    def _agregar(self, libro_id, titulo, autor, isbn, disponibles):
+        self._libros[libro_id] = (titulo, autor, isbn, disponibles)
+        for clave in claves(titulo, autor, isbn):
+            actual = self._ids_por_clave.get(clave)
+            if actual is None:
+                bisect.insort(self._claves, clave)
+                self._ids_por_clave[clave] = libro_id
+            elif isinstance(actual, int):
+                if actual != libro_id:
+                    self._ids_por_clave[clave] = array('l', sorted((actual, libro_id)))
+            else:
+                i = bisect.bisect_left(actual, libro_id)
+                if i == len(actual) or actual[i] != libro_id:
+                    actual.insert(i, libro_id)
+
+    def _quitar(self, libro_id):
+        libro = self._libros.pop(libro_id, None)
+        if libro is None:
+            return
+        for clave in claves(*libro[:3]):
+            actual = self._ids_por_clave.get(clave)
+            if actual is None:
+                continue
+            if isinstance(actual, int):
+                if actual == libro_id:
+                    del self._ids_por_clave[clave]
+                    del self._claves[bisect.bisect_left(self._claves, clave)]
+                continue
+            i = bisect.bisect_left(actual, libro_id)
+            if i < len(actual) and actual[i] == libro_id:
+                del actual[i]
+                if len(actual) == 1:
+                    self._ids_por_clave[clave] = actual[0]
+
+    def construir(self):
+        """Carga el catálogo completo; las claves se ordenan una sola vez al final.
+
+        Mientras tanto se sigue sirviendo el índice anterior (si lo hay) y los
+        cambios que lleguen se aplican al terminar.
+        """
+        with self._lock:
+            self._construyendo = True
+        conn = self.obtener_conexion()
+        if not conn:
+            with self._lock:
+                self._construyendo = False
+            raise mysql.connector.InterfaceError('Sin conexión para construir el índice de sugerencias')
+        libros = {}
+        ids_por_clave = {}
+        try:
+            cursor = conn.cursor()
+            # En orden de id: cada lista de ids queda ya ordenada
+            cursor.execute("SELECT id, titulo, autor, isbn, ejemplares_disponibles FROM libros ORDER BY id")
+            while True:
+                filas = cursor.fetchmany(5000)
+                if not filas:
+                    break
+                for libro_id, titulo, autor, isbn, disponibles in filas:
+                    libros[libro_id] = (titulo, autor, isbn, disponibles)
+                    for clave in claves(titulo, autor, isbn):
+                        actual = ids_por_clave.get(clave)
+                        if actual is None:
+                            ids_por_clave[clave] = libro_id
+                        elif isinstance(actual, int):
+                            ids_por_clave[clave] = [actual, libro_id]
+                        else:
+                            actual.append(libro_id)
+            cursor.close()
+        except mysql.connector.Error:
+            with self._lock:
+                self._construyendo = False
+            raise
+        finally:
+            conn.close()
+        for clave, ids in ids_por_clave.items():
+            if not isinstance(ids, int):
+                ids_por_clave[clave] = array('l', ids)
+        ordenadas = sorted(ids_por_clave)
+
+        with self._lock:
+            self._libros = libros
+            self._claves = ordenadas
+            self._ids_por_clave = ids_por_clave
+            self.listo = True
+            self._construyendo = False
+            pendientes, self._pendientes = self._pendientes, set()
+            recargar, self._recargar_todo = self._recargar_todo, False
+        if recargar:
+            self.construir()
+        elif pendientes:
+            self.recargar(pendientes)
+
+    def construir_en_segundo_plano(self):
+        """Lanza la construcción si no hay ya una en curso"""
+        with self._lock:
+            if self._construyendo:
+                return
+            self._construyendo = True
+
+        def ejecutar():
+            try:
+                self.construir()
+                logger.info("🔎 Índice de sugerencias listo: %s libros, %s claves",
+                            len(self._libros), len(self._claves))
+            except mysql.connector.Error as err:
+                logger.error("❌ Error al construir el índice de sugerencias: %s", err)
+        threading.Thread(target=ejecutar, name='indice-sugerencias', daemon=True).start()
+
+    def recargar(self, libro_ids):
+        """Vuelve a leer de la base de datos los libros indicados"""
+        libro_ids = list(libro_ids)
+        conn = self.obtener_conexion()
+        if not conn:
+            return
+        try:
+            cursor = conn.cursor()
+            marcadores = ', '.join(['%s'] * len(libro_ids))
+            cursor.execute(
+                f"SELECT id, titulo, autor, isbn, ejemplares_disponibles FROM libros WHERE id IN ({marcadores})",
+                libro_ids
+            )
+            filas = {fila[0]: fila for fila in cursor.fetchall()}
+            cursor.close()
+        finally:
+            conn.close()
+
+        with self._lock:
+            for libro_id in libro_ids:
+                fila = filas.get(libro_id)
+                actual = self._libros.get(libro_id)
+                if fila is None:
+                    self._quitar(libro_id)
+                elif actual is not None and actual[:3] == fila[1:4]:
+                    self._libros[libro_id] = actual[:3] + (fila[4],)
+                else:
+                    self._quitar(libro_id)
+                    self._agregar(*fila)
+
+    def aplicar_eventos(self, eventos):
+        """Oyente del difusor de disponibilidad: (id, libro_id, ejemplares_disponibles)"""
+        recargar_todo = any(libro_id is None for _, libro_id, _ in eventos)
+        libro_ids = {libro_id for _, libro_id, _ in eventos if libro_id is not None}
+        with self._lock:
+            if self._construyendo:
+                self._recargar_todo = self._recargar_todo or recargar_todo
+                self._pendientes.update(libro_ids)
+                return
+        try:
+            if recargar_todo:
+                # Cambio masivo (importación): se reconstruye entero fuera del hilo del difusor
+                self.construir_en_segundo_plano()
+            else:
+                self.recargar(libro_ids)
+        except mysql.connector.Error as err:
+            logger.error("❌ Error al actualizar el índice de sugerencias: %s", err)
+
+    def buscar(self, texto, limite=10):
+        """Libros disponibles con alguna clave que empiece por `texto`"""
+        prefijo = normalizar(texto)
+        if prefijo and all(c.isdigit() or c in 'x- ' for c in prefijo):
+            # Posible ISBN: las claves se guardan sin guiones ni espacios
+            prefijo = prefijo.replace('-', '').replace(' ', '')
+        prefijo = prefijo[:LONGITUD_CLAVE]
+        if not prefijo:
+            return []
+        # Las claves son palabras: se busca por la primera y el resto se comprueba
+        primera, _, resto = prefijo.partition(' ')
+        resultado = []
+        vistos = set()
+        recorridos = 0
+        with self._lock:
+            i = bisect.bisect_left(self._claves, primera)
+            while i < len(self._claves) and recorridos < RECORRIDO_MAXIMO and len(resultado) < limite:
+                clave = self._claves[i]
+                i += 1
+                if not clave.startswith(primera):
+                    break
+                for libro_id in _ids(self._ids_por_clave[clave]):
+                    recorridos += 1
+                    if libro_id in vistos:
+                        continue
+                    titulo, autor, isbn, disponibles = self._libros[libro_id]
+                    if resto and not any(f' {prefijo}' in f' {normalizar(campo)}' for campo in (titulo, autor)):
+                        continue
+                    vistos.add(libro_id)
+                    if (disponibles or 0) > 0:
+                        resultado.append({'id': libro_id, 'titulo': titulo, 'autor': autor, 'isbn': isbn,
+                                          'ejemplares_disponibles': disponibles})
+                        if len(resultado) >= limite:
+                            break
+        return resultado
+
+    def estadisticas(self):
+        with self._lock:
+            return {'listo': self.listo, 'libros': len(self._libros), 'claves': len(self._claves)}
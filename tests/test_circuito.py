@@ -0,0 +1,121 @@
+import threading
+import unittest
+from unittest import mock
+
+import mysql.connector
+
+import circuito
+from pool_conexiones import PoolAgotado
+
+
+class RelojFalso:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+class CircuitoTest(unittest.TestCase):
+
+    def setUp(self):
+        self.reloj = RelojFalso()
+        parche = mock.patch('circuito.time.monotonic', self.reloj)
+        parche.start()
+        self.addCleanup(parche.stop)
+        self.corte = circuito.Circuito(umbral_fallos=3, espera=10)
+
+    def abrir(self):
+        for _ in range(3):
+            self.corte.fallo()
+        self.assertEqual(self.corte.estado, circuito.ABIERTO)
+
+    def test_se_abre_al_llegar_al_umbral(self):
+        self.corte.fallo()
+        self.corte.fallo()
+        self.assertTrue(self.corte.permitir())
+        self.corte.fallo()
+        self.assertFalse(self.corte.permitir())
+        self.assertEqual(self.corte.estadisticas()['aperturas'], 1)
+
+    def test_los_fallos_antiguos_salen_de_la_ventana(self):
+        self.corte.fallo()
+        self.corte.fallo()
+        self.reloj.ahora += 11
+        self.corte.fallo()
+        self.assertEqual(self.corte.estado, circuito.CERRADO)
+
+    def test_un_exito_con_el_circuito_cerrado_no_borra_los_fallos(self):
+        self.corte.fallo()
+        self.corte.fallo()
+        self.corte.exito()
+        self.corte.fallo()
+        self.assertEqual(self.corte.estado, circuito.ABIERTO)
+
+    def test_semiabierto_deja_pasar_una_sola_prueba(self):
+        self.abrir()
+        self.reloj.ahora += 10
+        self.assertTrue(self.corte.permitir())
+        self.assertEqual(self.corte.estado, circuito.SEMIABIERTO)
+        self.assertFalse(self.corte.permitir())
+
+    def test_prueba_correcta_cierra(self):
+        self.abrir()
+        self.reloj.ahora += 10
+        self.assertTrue(self.corte.permitir())
+        self.corte.exito()
+        self.corte.soltar_sondeo()
+        self.assertEqual(self.corte.estado, circuito.CERRADO)
+        self.assertTrue(self.corte.permitir())
+
+    def test_prueba_fallida_vuelve_a_abrir(self):
+        self.abrir()
+        self.reloj.ahora += 10
+        self.assertTrue(self.corte.permitir())
+        self.corte.fallo()
+        self.corte.soltar_sondeo()
+        self.assertEqual(self.corte.estado, circuito.ABIERTO)
+        self.assertFalse(self.corte.permitir())
+
+    def test_prueba_sin_resultado_libera_el_sondeo(self):
+        # Un error que no cuenta como caída (p. ej. 1045, acceso denegado)
+        self.abrir()
+        self.reloj.ahora += 10
+        self.assertTrue(self.corte.permitir())
+        self.corte.soltar_sondeo()
+        self.assertEqual(self.corte.estado, circuito.SEMIABIERTO)
+        self.assertTrue(self.corte.permitir())
+
+    def test_soltar_sondeo_de_otro_hilo_no_libera_la_prueba(self):
+        self.abrir()
+        self.reloj.ahora += 10
+        self.assertTrue(self.corte.permitir())
+        hilo = threading.Thread(target=self.corte.soltar_sondeo)
+        hilo.start()
+        hilo.join()
+        self.assertFalse(self.corte.permitir())
+
+
+class FalloDeServidorTest(unittest.TestCase):
+
+    def test_errores_de_conexion(self):
+        self.assertTrue(circuito.es_fallo_de_servidor(mysql.connector.DatabaseError(errno=2003)))
+        self.assertTrue(circuito.es_fallo_de_servidor(mysql.connector.OperationalError(errno=2013)))
+        self.assertTrue(circuito.es_fallo_de_servidor(mysql.connector.InterfaceError(errno=2006)))
+        self.assertTrue(circuito.es_fallo_de_servidor(mysql.connector.OperationalError(errno=2055)))
+
+    def test_errores_del_sql_o_de_acceso(self):
+        self.assertFalse(circuito.es_fallo_de_servidor(mysql.connector.ProgrammingError(errno=1045)))
+        self.assertFalse(circuito.es_fallo_de_servidor(mysql.connector.IntegrityError(errno=1062)))
+
+    def test_carga_local_no_cuenta_como_caida(self):
+        # Pool agotado, bloqueos y timeouts de consulta: el servidor responde
+        self.assertFalse(circuito.es_fallo_de_servidor(PoolAgotado('sin conexiones')))
+        self.assertFalse(circuito.es_fallo_de_servidor(mysql.connector.DatabaseError(errno=1213)))
+        self.assertFalse(circuito.es_fallo_de_servidor(mysql.connector.DatabaseError(errno=1205)))
+        self.assertFalse(circuito.es_fallo_de_servidor(mysql.connector.DatabaseError(errno=3024)))
+        self.assertFalse(circuito.es_fallo_de_servidor(mysql.connector.InterfaceError('Cursor no disponible')))
+
+
+if __name__ == '__main__':
+    unittest.main()
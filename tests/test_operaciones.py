@@ -0,0 +1,109 @@
+import threading
+import time
+import unittest
+from datetime import date
+
+import operaciones
+
+
+class Interbloqueo(Exception):
+    pass
+
+
+class BaseFalsa:
+    """Libros con un bloqueo de fila cada uno y préstamos abiertos (id -> libro_id)"""
+
+    def __init__(self, libros, prestamos):
+        self.filas = {libro_id: threading.Lock() for libro_id in libros}
+        self.prestamos = prestamos
+
+
+class CursorFalso:
+    """Cursor de una transacción que solo simula los bloqueos de fila de libros"""
+
+    def __init__(self, base):
+        self.base = base
+        self.bloqueados = []
+        self.rowcount = 0
+        self.lastrowid = 1
+        self._filas = []
+
+    def _bloquear(self, libro_ids):
+        for libro_id in libro_ids:
+            if libro_id in self.bloqueados:
+                continue
+            if not self.base.filas[libro_id].acquire(timeout=2):
+                raise Interbloqueo(f'Esperando al libro {libro_id}')
+            self.bloqueados.append(libro_id)
+            # Da tiempo a que el otro lote tome sus propios bloqueos
+            time.sleep(0.05)
+
+    def execute(self, sql, params=()):
+        sql = ' '.join(sql.split())
+        params = list(params)
+        self.rowcount = 1
+        self._filas = []
+        if sql.startswith('SELECT DISTINCT libro_id FROM prestamos'):
+            self._filas = [(self.base.prestamos[i],) for i in params]
+        elif sql.startswith('SELECT id FROM libros') and sql.endswith('FOR UPDATE'):
+            self._bloquear(params)
+        elif sql.startswith('UPDATE libros'):
+            self._bloquear([params[1]])
+        elif sql.startswith('SELECT id, libro_id, estado, prestatario_id FROM prestamos'):
+            self._filas = [(i, self.base.prestamos[i], 'prestado', None) for i in params]
+        elif sql.startswith('UPDATE prestamos'):
+            self.rowcount = len(params) - 1
+        elif sql.startswith('SELECT id, COALESCE(genero'):
+            self._filas = [(i, '') for i in params]
+
+    def fetchall(self):
+        return self._filas
+
+    def fetchone(self):
+        return self._filas[0] if self._filas else None
+
+    def terminar(self):
+        for libro_id in self.bloqueados:
+            self.base.filas[libro_id].release()
+        self.bloqueados = []
+
+
+class LotesCruzadosTest(unittest.TestCase):
+
+    def test_lotes_cruzados_no_se_interbloquean(self):
+        # A devuelve el libro 1 y presta el 2; B devuelve el 2 y presta el 1
+        base = BaseFalsa(libros=(1, 2), prestamos={10: 1, 20: 2})
+        lotes = {'A': ([10], [2], 'a@example.com'), 'B': ([20], [1], 'b@example.com')}
+        salida = threading.Barrier(len(lotes))
+        errores = []
+
+        def ejecutar(devolver, prestar, email):
+            cursor = CursorFalso(base)
+            salida.wait()
+            try:
+                operaciones.bloquear_libros(cursor, prestar, devolver)
+                operaciones.devolver_lote(cursor, devolver, date(2024, 3, 1))
+                operaciones.prestar_lote(cursor, prestar, 'Lector', email, '', date(2024, 3, 1),
+                                         date(2024, 3, 15))
+            except Interbloqueo as err:
+                errores.append(err)
+            finally:
+                cursor.terminar()
+
+        hilos = [threading.Thread(target=ejecutar, args=argumentos) for argumentos in lotes.values()]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(errores, [])
+
+    def test_bloquea_la_union_en_orden_de_id(self):
+        base = BaseFalsa(libros=(1, 2, 3), prestamos={10: 3, 20: 1})
+        cursor = CursorFalso(base)
+        operaciones.bloquear_libros(cursor, [2, 3], [10, 20])
+        self.assertEqual(cursor.bloqueados, [1, 2, 3])
+        cursor.terminar()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from unittest import mock
+
+import mysql.connector
+
+import replicas
+
+
+class PoolFalso:
+    def __init__(self, caido=False):
+        self.caido = caido
+        self.intentos = 0
+
+    def obtener(self):
+        self.intentos += 1
+        if self.caido:
+            raise mysql.connector.InterfaceError(errno=2003, msg="Can't connect to MySQL server")
+        return ConexionFalsa()
+
+    def estadisticas(self):
+        return {}
+
+
+class ConexionFalsa:
+    def close(self):
+        pass
+
+
+class ReplicasTest(unittest.TestCase):
+
+    def setUp(self):
+        self.ahora = 1000.0
+        parche = mock.patch('circuito.time.monotonic', lambda: self.ahora)
+        parche.start()
+        self.addCleanup(parche.stop)
+        retraso = mock.patch('replicas.retraso_replica', return_value=0)
+        retraso.start()
+        self.addCleanup(retraso.stop)
+        self.caida = PoolFalso(caido=True)
+        self.sana = PoolFalso()
+        self.replicas = replicas.Replicas([('caida', self.caida), ('sana', self.sana)], espera_caida=10)
+
+    def test_una_replica_caida_se_salta_durante_la_espera(self):
+        for _ in range(6):
+            self.assertIsNotNone(self.replicas.obtener())
+        self.assertEqual(self.caida.intentos, 1)
+        self.assertEqual(self.replicas.estadisticas()['saltadas'], 2)
+
+    def test_pasada_la_espera_se_vuelve_a_probar(self):
+        self.replicas.obtener()
+        self.ahora += 10
+        self.caida.caido = False
+        for _ in range(2):
+            self.replicas.obtener()
+        self.assertEqual(self.caida.intentos, 2)
+        self.assertEqual(self.replicas.estadisticas()['replicas'][0]['circuito'], 'cerrado')
+
+
+if __name__ == '__main__':
+    unittest.main()
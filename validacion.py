@@ -0,0 +1,94 @@
+from datetime import date
+
+
+def validar_libro(datos):
+    """Normaliza y valida los campos de un libro con las reglas del formulario de alta.
+
+    `datos` es cualquier mapeo (request.form, fila de CSV, objeto JSON).
+    Devuelve (libro, None) si es válido o (None, mensaje de error).
+    """
+    def texto(campo):
+        valor = datos.get(campo)
+        return str(valor).strip() if valor is not None else ''
+
+    titulo = texto('titulo')
+    autor = texto('autor')
+    isbn = texto('isbn')
+    ejemplares = datos.get('ejemplares', 1)
+
+    if not titulo or not autor:
+        return None, 'El título y autor son obligatorios'
+
+    if isbn and len(isbn) > 20:
+        return None, 'El ISBN no puede tener más de 20 caracteres'
+
+    try:
+        ejemplares = int(ejemplares)
+    except (TypeError, ValueError):
+        return None, 'Número de ejemplares inválido'
+    if ejemplares < 1:
+        return None, 'Debe haber al menos 1 ejemplar'
+
+    # Mismos límites que el campo del formulario (min="1000", max=año actual)
+    anio_publicacion = texto('anio_publicacion') or None
+    if anio_publicacion is not None:
+        try:
+            anio_publicacion = int(anio_publicacion)
+        except ValueError:
+            return None, 'Año de publicación inválido'
+        if not 1000 <= anio_publicacion <= date.today().year:
+            return None, f'El año de publicación debe estar entre 1000 y {date.today().year}'
+
+    libro = {
+        'titulo': titulo,
+        'autor': autor,
+        'isbn': isbn or None,
+        'genero': texto('genero') or None,
+        'anio_publicacion': anio_publicacion,
+        'editorial': texto('editorial') or None,
+        'ejemplares': ejemplares,
+    }
+    return libro, None
+
+
+def validar_prestamo(datos):
+    """Normaliza y valida los campos de un préstamo con las reglas del formulario.
+
+    Las fechas se devuelven como `date`. Devuelve (prestamo, None) si es válido o (None, mensaje de error).
+    """
+    def texto(campo):
+        valor = datos.get(campo)
+        return str(valor).strip() if valor is not None else ''
+
+    libro_id = texto('libro_id')
+    nombre_prestatario = texto('nombre_prestatario')
+    fecha_prestamo = texto('fecha_prestamo')
+    fecha_devolucion = texto('fecha_devolucion')
+
+    if not libro_id or not nombre_prestatario or not fecha_prestamo or not fecha_devolucion:
+        return None, 'Todos los campos obligatorios deben ser completados'
+
+    try:
+        libro_id = int(libro_id)
+    except ValueError:
+        return None, 'Libro inválido'
+
+    try:
+        fecha_prestamo = date.fromisoformat(fecha_prestamo)
+        fecha_devolucion = date.fromisoformat(fecha_devolucion)
+    except ValueError:
+        return None, 'Las fechas deben tener el formato AAAA-MM-DD'
+
+    if fecha_devolucion <= fecha_prestamo:
+        return None, 'La fecha de devolución debe ser posterior a la fecha de préstamo'
+
+    prestamo = {
+        'libro_id': libro_id,
+        'nombre_prestatario': nombre_prestatario,
+        'email_prestatario': texto('email_prestatario'),
+        'telefono': texto('telefono'),
+        'fecha_prestamo': fecha_prestamo,
+        'fecha_devolucion': fecha_devolucion,
+        'observaciones': texto('observaciones'),
+    }
+    return prestamo, None